@@ -7,7 +7,7 @@ import sys
 from ait.commons.util.bucket_policy import ALLOWED_PERMS, DEFAULT_PERMS
 from ait.commons.util.cmd import Cmd
 from ait.commons.util.common import is_valid_project_name, is_valid_uuid, INGEST_UPLOAD_AREA_PREFIX
-from ait.commons.util.settings import DEFAULT_PROFILE, DEBUG_MODE, NAME, VERSION, DIR_SUPPORT
+from ait.commons.util.settings import DEFAULT_PROFILE, DEBUG_MODE, NAME, VERSION, DIR_SUPPORT, TRANSFER_MAX_WORKERS
 
 
 def valid_project_name(string):
@@ -28,6 +28,16 @@ def valid_path(path):
         raise argparse.ArgumentTypeError(f"'{path}' is not a valid path")
 
 
+def positive_int(string):
+    try:
+        value = int(string)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"'{string}' is not a positive integer")
+    return value
+
+
 def valid_remote_path(path):
     # file, dir/file, dir, dir/, dir/dir1, etc
     err_msg = f"'{path}' is not a valid path. e.g. paths - file, dir/file, dir, dir/, dir/dir1, etc"
@@ -89,6 +99,12 @@ def parse_args(args):
                                                                                         f'download. Default is '
                                                                                         f'{DEFAULT_PERMS}')
 
+    parser_create_areas = cmd_parser.add_parser('create-areas',
+                                                help='create the upload areas listed in a file (authorised users only)')
+    parser_create_areas.add_argument('FILE', type=valid_path,
+                                     help='CSV (with a header) or JSON list of areas, each with a name, DPC and '
+                                          f'optional perms (default {DEFAULT_PERMS})')
+
     parser_select = cmd_parser.add_parser('select', help='select or show the active upload area')
     parser_select.add_argument('AREA', help='area name', type=valid_area, nargs='?')
 
@@ -99,6 +115,8 @@ def parse_args(args):
 
     parser_list = cmd_parser.add_parser('list', help='list contents of the area')
     parser_list.add_argument('-b', action='store_true', help='list all areas in the S3 bucket (authorised users only)')
+    parser_list.add_argument('--fast', action='store_true',
+                             help='list keys, sizes and ETags from the listing, without looking up the md5s')
 
     # parser_upload = cmd_parser.add_parser('upload', help='upload files to the area')
     # group_upload = parser_upload.add_mutually_exclusive_group(required=True)
@@ -114,12 +132,29 @@ def parse_args(args):
         parser_upload.add_argument('-r', action='store_true', help='recursively upload sub-directories')
         parser_upload.add_argument('-d', metavar='DIR', help='upload to specified directory')
     parser_upload.add_argument('-o', action='store_true', help='overwrite files with same names')
+    parser_upload.add_argument('--changed-only', action='store_true',
+                               help='only upload new files or files whose size or md5 differ from the uploaded ones')
+    parser_upload.add_argument('--single-pass', action='store_true',
+                               help='compute md5 while uploading, reading each file only once')
+    parser_upload.add_argument('--no-progress', action='store_true', help='don\'t display the transfer progress')
+    group_interrupted = parser_upload.add_mutually_exclusive_group(required=False)
+    group_interrupted.add_argument('--resume', action='store_true',
+                                   help='resume the interrupted uploads of the files being uploaded')
+    group_interrupted.add_argument('--abort-interrupted', action='store_true',
+                                   help='abort the interrupted uploads to the area')
 
     parser_download = cmd_parser.add_parser('download', help='download files from the area')
     group_download = parser_download.add_mutually_exclusive_group(required=True)
 
     group_download.add_argument('-a', action='store_true', help='download all files from selected area')
     group_download.add_argument('-f', metavar='file', nargs='+', help='download specified file(s) only')
+    parser_download.add_argument('--no-progress', action='store_true', help='don\'t display the transfer progress')
+    parser_download.add_argument('--skip-existing', action='store_true',
+                                 help='only download files missing or whose size or md5 differ from the local ones')
+    parser_download.add_argument('--verify', action='store_true',
+                                 help='verify the md5 of each file as it is downloaded')
+    parser_download.add_argument('-j', '--workers', metavar='N', type=positive_int,
+                                 help=f'download N files at a time. Default is {TRANSFER_MAX_WORKERS}')
 
     parser_delete = cmd_parser.add_parser('delete', help='delete files from the area')
     parser_delete.add_argument('PATH', help='path to file or directory to delete', type=valid_remote_path, nargs='*')
@@ -127,14 +162,25 @@ def parse_args(args):
     group_delete.add_argument('-a', action='store_true', help='delete all files from the area')
     group_delete.add_argument('-d', action='store_true', help='delete upload area and contents (authorised users only)')
 
+    parser_delete_areas = cmd_parser.add_parser('delete-areas',
+                                                help='delete upload areas and contents (authorised users only)')
+    parser_delete_areas.add_argument('AREA', help='area to delete', type=valid_area, nargs='*')
+    parser_delete_areas.add_argument('-f', metavar='FILE', type=valid_path,
+                                     help='delete the areas listed in FILE, one per line')
+
+    parser_compact_policy = cmd_parser.add_parser('compact-policy',
+                                                  help='compact the area permissions of the bucket policy and show '
+                                                       'its size (authorised users only)')
+
     parser_sync = cmd_parser.add_parser('sync',
                                         help='copy data from selected upload area to ingest upload area (authorised users only)')
     parser_sync.add_argument('INGEST_UPLOAD_AREA', help='Ingest upload area', type=valid_ingest_upload_area)
+    parser_sync.add_argument('--no-progress', action='store_true', help='don\'t display the transfer progress')
 
     ps = [parser]
     if DEBUG_MODE:
-        ps = [parser, parser_config, parser_create, parser_select, parser_list, parser_upload, parser_download,
-              parser_delete, parser_sync]
+        ps = [parser, parser_config, parser_create, parser_create_areas, parser_select, parser_list, parser_upload,
+              parser_download, parser_delete, parser_delete_areas, parser_compact_policy, parser_sync]
 
     for p in ps:
         p.add_argument(
@@ -163,11 +209,10 @@ def main():
         # However, os_.exit() is nasty because it allows the Python interpreter to do no cleanup
         # One alternative is to make our transfer threads daemon. However, there are then other non-daemon threads
         # employed by boto for the multi-part transfer. Here, configuring boto to only use the main thread for transfer
-        # works but with unmeasured effects on transfer speed. Alternatively, it might be possible to call
-        # boto3 client.abort_multipart_upload() but don't know for sure and in any case this requires more work to
-        # keep hold of upload IDs, etc.
+        # works but with unmeasured effects on transfer speed.
         #
-        # So for now risking the kill though might want to revisit this decision.
+        # Multipart uploads are recorded part by part in the transfer journal as they complete, so nothing is lost
+        # by the kill - the next upload of the same files can resume them (--resume).
         os._exit(0)
 
 
@@ -1,16 +1,54 @@
 import json
+import threading
 
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
 from ait.commons.util.aws_cognito_authenticator import AwsCognitoAuthenticator
+from ait.commons.util.credential_cache import CachedCredentials, get_cached_credentials, set_cached_credentials, \
+    clear_cached_credentials
 from ait.commons.util.settings import AWS_SECRET_NAME_AK_BUCKET, AWS_SECRET_NAME_SK_BUCKET, \
-    AWS_SECRET_NAME_MORPHIC_BUCKET, COGNITO_MORPHIC_UTIL_ADMIN, S3_REGION
+    AWS_SECRET_NAME_MORPHIC_BUCKET, COGNITO_MORPHIC_UTIL_ADMIN, S3_REGION, S3_MAX_POOL_CONNECTIONS
 
 
 def static_bucket_name():
     return 'morphic-bio'
 
 
+class RemoteObject:
+    """
+    An object as listed by list_objects_v2.
+    md5 is only known from the listing for single part uploads, whose ETag is the MD5 of the content.
+    """
+
+    def __init__(self, key, size, etag, md5=None, last_modified=None):
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.md5 = md5
+        self.last_modified = last_modified  # epoch seconds
+
+    @staticmethod
+    def from_listing(obj):
+        etag = obj.get('ETag', '').strip('"')
+        last_modified = obj['LastModified'].timestamp() if 'LastModified' in obj else None
+        return RemoteObject(obj['Key'], obj.get('Size', 0), etag, etag_md5(etag), last_modified)
+
+    def __str__(self):
+        return f'RemoteObject (key={self.key}, size={self.size}, etag={self.etag}, md5={self.md5})'
+
+
+def etag_md5(etag):
+    """MD5 of the content from an ETag, None for multipart uploads whose ETag isn't an MD5."""
+    etag = (etag or '').strip('"')
+    return etag if etag and '-' not in etag else None
+
+
+def s3_config():
+    return Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+
+
 class Aws:
 
     def __init__(self, user_profile):
@@ -20,6 +58,10 @@ class Aws:
         self.secret_key = None
         self.access_key = None
         self.user_profile = user_profile
+        self.from_cache = False
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._s3_client = None
         self.common_session = self.new_session()
         self.bucket_name = 'morphic-bio'
 
@@ -48,6 +90,27 @@ class Aws:
         return self.bucket_name
 
     def new_session(self):
+        credentials = get_cached_credentials(self.user_profile.name, self.user_profile.username)
+        self.from_cache = credentials is not None
+
+        if credentials is None:
+            credentials = self.authenticate()
+
+        self.is_user = credentials.is_user
+        self.user_dir_list = credentials.user_dir_list
+        self.center_name = credentials.center_name
+        self.access_key = credentials.bucket_access_key
+        self.secret_key = credentials.bucket_secret_key
+
+        return boto3.Session(region_name=S3_REGION,
+                             aws_access_key_id=self.access_key,
+                             aws_secret_access_key=self.secret_key)
+
+    def authenticate(self):
+        """
+        Run the full cognito and secrets manager handshake and cache the result for the profile
+        :return: CachedCredentials
+        """
         aws_cognito_authenticator = AwsCognitoAuthenticator(self)
         secret_manager_client = aws_cognito_authenticator.get_secret_manager_client(self.user_profile.username,
                                                                                     self.user_profile.password)
@@ -55,20 +118,65 @@ class Aws:
         if secret_manager_client is None:
             print('Failure while re-establishing Amazon Web Services session, report this error to the DRACC admin')
             raise Exception
-        else:
-            self.is_user = aws_cognito_authenticator.is_valid_user()
-            self.user_dir_list = aws_cognito_authenticator.get_user_dir_list()
-            self.center_name = aws_cognito_authenticator.get_center_name()
 
-            return boto3.Session(region_name=S3_REGION,
-                                 aws_access_key_id=self.get_access_key(secret_manager_client),
-                                 aws_secret_access_key=self.get_secret_key(secret_manager_client))
+        aws_cred = aws_cognito_authenticator.get_aws_credentials()
+        expiration = aws_cred.get('Expiration')
+
+        credentials = CachedCredentials(username=self.user_profile.username,
+                                        bucket_access_key=self.get_access_key(secret_manager_client),
+                                        bucket_secret_key=self.get_secret_key(secret_manager_client),
+                                        center_name=aws_cognito_authenticator.get_center_name(),
+                                        user_dir_list=aws_cognito_authenticator.get_user_dir_list(),
+                                        is_user=aws_cognito_authenticator.is_valid_user(),
+                                        expiry=expiration.timestamp() if expiration else 0)
+
+        if self.user_profile.name:
+            set_cached_credentials(self.user_profile.name, credentials)
+
+        return credentials
+
+    def s3_client(self):
+        """
+        Shared low-level s3 client of the common session.
+        Low-level clients are thread safe, so the same client (and its connection pool) is
+        handed to every transfer thread instead of creating a new session per operation.
+        """
+        with self._lock:
+            if self._s3_client is None:
+                self._s3_client = self.common_session.client('s3', config=s3_config())
+            return self._s3_client
+
+    def s3_resource(self):
+        """
+        s3 resource of the common session for the calling thread.
+        Resources are not thread safe, so one is created per thread.
+        """
+        s3_resource = getattr(self._local, 's3_resource', None)
+        if s3_resource is None:
+            with self._lock:  # sessions are not thread safe either
+                s3_resource = self.common_session.resource('s3', config=s3_config())
+            self._local.s3_resource = s3_resource
+        return s3_resource
 
     def is_valid_credentials(self):
         """
         Validate user config/credentials by making a get_caller_identity aws api call
         :return:
         """
+        if self.caller_is_admin():
+            return True
+
+        if self.from_cache:
+            # cached bucket keys may have been rotated since they were cached, re-authenticate once
+            clear_cached_credentials(self.user_profile.name)
+            self.common_session = self.new_session()
+            self._s3_client = None
+            self._local = threading.local()
+            return self.caller_is_admin()
+
+        return False
+
+    def caller_is_admin(self):
         sts = self.common_session.client('sts')
 
         try:
@@ -96,7 +204,7 @@ class Aws:
         which suggests using Object.load() - which does a HEAD request, however, user doesn't have
         s3:GetObject permission by default, so this will fail for them.
         """
-        response = self.new_session().client('s3').list_objects_v2(
+        response = self.s3_client().list_objects_v2(
             Bucket=self.bucket_name,
             Prefix=key,
         )
@@ -104,3 +212,38 @@ class Aws:
             if obj['Key'] == key:
                 return True
         return False
+
+    def list_objects(self, prefix):
+        """
+        Generator of the objects under prefix, following list_objects_v2 pagination (1000 keys per page)
+        """
+        paginator = self.s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                yield obj
+
+    def list_prefixes(self, prefix):
+        """
+        Generator of the prefixes (directories) directly under prefix, following the listing pagination
+        """
+        paginator = self.s3_client().get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix, Delimiter='/'):
+            for d in page.get('CommonPrefixes', []):
+                yield d['Prefix']
+
+    def remote_index(self, prefix):
+        """
+        Index of the objects under prefix from a single paginated listing
+        :return: dict of key -> RemoteObject
+        """
+        return {obj['Key']: RemoteObject.from_listing(obj) for obj in self.list_objects(prefix)}
+
+    def get_md5_metadata(self, key):
+        """
+        md5 user metadata written on upload, None if not set or the object can't be read (HEAD needs s3:GetObject)
+        """
+        try:
+            resp = self.s3_client().head_object(Bucket=self.bucket_name, Key=key)
+            return resp.get('Metadata', {}).get('md5')
+        except ClientError:
+            return None
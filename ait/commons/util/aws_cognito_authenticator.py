@@ -17,6 +17,7 @@ class AwsCognitoAuthenticator:
         self.is_user = False  # not admin
         self.user_dir_list = None
         self.center_name = None  # custom attribute DPC
+        self.aws_credentials = None  # temporary credentials of the cognito identity
 
     def validate_cognito_identity(self, profile, username, password):
 
@@ -143,6 +144,7 @@ class AwsCognitoAuthenticator:
                 session_token = aws_cred['SessionToken']
 
                 if session_token:
+                    self.aws_credentials = aws_cred
                     secret_mgr_client = boto3.client('secretsmanager', region_name="eu-west-2",
                                                      aws_access_key_id=aws_cred['AccessKeyId'],
                                                      aws_secret_access_key=aws_cred['SecretKey'],
@@ -164,3 +166,6 @@ class AwsCognitoAuthenticator:
 
     def get_center_name(self):
         return self.center_name
+
+    def get_aws_credentials(self):
+        return self.aws_credentials
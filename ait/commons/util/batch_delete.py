@@ -0,0 +1,56 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from botocore.exceptions import ClientError
+
+from ait.commons.util.settings import DELETE_BATCH_SIZE, DELETE_MAX_BATCHES
+
+
+def batches(keys, size=DELETE_BATCH_SIZE):
+    """Generator of lists of up to size keys, taken from keys as they are generated."""
+    keys = iter(keys)
+    while True:
+        batch = list(islice(keys, size))
+        if not batch:
+            return
+        yield batch
+
+
+def delete_batch(s3_client, bucket_name, batch):
+    """
+    Delete the keys with a single DeleteObjects request.
+    Returns (key, error code) in the order of the batch, the error code None for a deleted key.
+    """
+    try:
+        resp = s3_client.delete_objects(Bucket=bucket_name, Delete={
+            'Objects': [{'Key': k} for k in batch],
+            'Quiet': True  # only the keys that failed are returned
+        })
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        return [(k, code) for k in batch]
+
+    errors = {err['Key']: err.get('Code', 'Error') for err in resp.get('Errors', [])}
+    return [(k, errors.get(k)) for k in batch]
+
+
+def delete_keys(aws, keys, max_batches=None):
+    """
+    Generator of (key, error code) of the keys deleted in batches of DELETE_BATCH_SIZE keys, in the order
+    of keys, with up to max_batches (DELETE_MAX_BATCHES by default) DeleteObjects requests in flight.
+    The error code is None for a deleted key, otherwise the per-key error of the batch response
+    (e.g. AccessDenied).
+    keys may be a generator, consumed as the batches are sent.
+    """
+    max_batches = max_batches or DELETE_MAX_BATCHES
+    s3_client = aws.s3_client()
+    with ThreadPoolExecutor(max_workers=max_batches) as executor:
+        pending = deque()
+        for batch in batches(keys):
+            pending.append(executor.submit(delete_batch, s3_client, aws.bucket_name, batch))
+            while pending and (pending[0].done() or len(pending) >= max_batches):
+                yield from pending.popleft().result()
+
+        for future in pending:
+            yield from future.result()
@@ -1,4 +1,6 @@
-from ait.commons.util.settings import AWS_ACCOUNT, IAM_USER
+import json
+
+from ait.commons.util.settings import AWS_ACCOUNT, IAM_USER, MANIFEST_NAME
 
 """
 User groups:
@@ -72,3 +74,178 @@ def denyDeleteStmt():
     "Resource": [],
     "Principal": { "AWS": [f"arn:aws:iam::{AWS_ACCOUNT}:user/{IAM_USER}"]}
 }
+
+
+def manifestAccessStmt(bucket_name):
+    # the checksum manifests of the areas, read by upload, list and download without d permission
+    return {
+    "Sid": "ManifestAccess",
+    "Effect": "Allow",
+    "Action": "s3:GetObject",
+    "Resource": f"arn:aws:s3:::{bucket_name}/*/{MANIFEST_NAME}",
+    "Principal": { "AWS": [f"arn:aws:iam::{AWS_ACCOUNT}:user/{IAM_USER}"]}
+}
+
+
+def add_manifest_access(policy, bucket_name):
+    """Add the ManifestAccess statement to the policy if missing. Returns True if added."""
+    if any(stmt.get('Sid') == 'ManifestAccess' for stmt in policy['Statement']):
+        return False
+    policy['Statement'].append(manifestAccessStmt(bucket_name))
+    return True
+
+
+# maximum size of a bucket policy, beyond which put fails with MalformedPolicy
+BUCKET_POLICY_MAX_SIZE = 20480
+
+"""
+Compact encoding of the area perms in the AllowDownload and DenyDelete statements
+
+An area morphic-DPC/name/ is a resource arn:aws:s3:::<bucket>/morphic-DPC/name/* of a statement. Where every area of
+a DPC is in a statement, their resources are collapsed into a single DPC-level wildcard
+arn:aws:s3:::<bucket>/morphic-DPC/*. Before the resources of a statement are changed, its wildcards are expanded back
+into the resources of the areas they stood for (the areas of the DPC other than the ones being added), so that a new
+area with different perms doesn't fall under the wildcard of its DPC.
+Resources that are neither (e.g. areas created before DPCs) are kept as they are, deduped.
+"""
+
+PERMS_STATEMENTS = [
+    # Sid, template, whether the perms of an area need its resource in the statement
+    ('AllowDownload', allowDownloadStmt, lambda perms: 'd' in perms),
+    ('DenyDelete', denyDeleteStmt, lambda perms: 'x' not in perms),
+]
+
+
+def area_resource(bucket_name, key):
+    """Resource of the objects under the key, an area (morphic-DPC/name/) or DPC (morphic-DPC/)."""
+    return f'arn:aws:s3:::{bucket_name}/{key}*'
+
+
+def resource_key(bucket_name, resource):
+    """Key of an area or DPC resource, None for any other resource."""
+    prefix = f'arn:aws:s3:::{bucket_name}/'
+    if isinstance(resource, str) and resource.startswith(prefix) and resource.endswith('/*'):
+        key = resource[len(prefix):-1]
+        if dpc_of(key) or is_dpc(key):
+            return key
+    return None
+
+
+def is_dpc(key):
+    return key.startswith('morphic-') and key.endswith('/') and key.count('/') == 1
+
+
+def dpc_of(key):
+    """DPC (morphic-DPC/) of an area key (morphic-DPC/name/), None if not an area key."""
+    parts = key.split('/')
+    if key.startswith('morphic-') and len(parts) == 3 and parts[1] and not parts[2]:
+        return parts[0] + '/'
+    return None
+
+
+def expand_resources(bucket_name, resources, dpc_areas):
+    """
+    Resources deduped, with the DPC wildcards replaced by the resources of the areas dpc_areas(dpc).
+    A wildcard is kept if dpc_areas(dpc) is None.
+    """
+    expanded = {}
+    for res in resources:
+        key = resource_key(bucket_name, res)
+        areas = dpc_areas(key) if key and is_dpc(key) else None
+        if areas is None:
+            expanded[res] = None
+        else:
+            for area in sorted(areas):
+                expanded[area_resource(bucket_name, area)] = None
+    return list(expanded)
+
+
+def compact_resources(bucket_name, resources, dpc_areas):
+    """
+    Resources deduped, with the area resources of a DPC collapsed into the DPC wildcard where all the
+    areas of the DPC, dpc_areas(dpc), are in them. In the order of the resources, a wildcard in place of
+    the first area of its DPC. The areas of a DPC are left as they are if dpc_areas(dpc) is None.
+    """
+    resources = list(dict.fromkeys(resources))
+    in_resources = {}
+    for res in resources:
+        key = resource_key(bucket_name, res)
+        if key and dpc_of(key):
+            in_resources.setdefault(dpc_of(key), set()).add(key)
+
+    collapsed = set()
+    for dpc, areas in in_resources.items():
+        dpc_all_areas = dpc_areas(dpc)
+        if dpc_all_areas and dpc_all_areas <= areas:
+            collapsed.add(dpc)
+
+    compacted = {}
+    for res in resources:
+        key = resource_key(bucket_name, res)
+        dpc = dpc_of(key) if key else None
+        compacted[area_resource(bucket_name, dpc) if dpc in collapsed else res] = None
+    return list(compacted)
+
+
+def update_area_perms(policy, bucket_name, list_dpc_areas, add=(), remove=(), compact_all=False):
+    """
+    Add the perms of the areas add, (area key, perms) pairs, and remove the areas remove (area keys)
+    from the AllowDownload and DenyDelete statements of the policy, compacted.
+    list_dpc_areas(dpc) returns the keys of the areas of the DPC in the bucket, called once per DPC and
+    only for the DPCs of the areas added or removed, or all the DPCs in the policy if compact_all.
+    Areas added that were in the policy already are replaced with their new perms.
+    Returns True if the policy changed.
+    """
+    added = {key for key, _ in add}
+    removed = set(remove)
+    changed_keys = added | removed
+    changed_dpcs = {dpc_of(key) for key in changed_keys}
+    listed = {}
+
+    def listed_areas(dpc):
+        if not compact_all and dpc not in changed_dpcs:
+            return None
+        if dpc not in listed:
+            listed[dpc] = set(list_dpc_areas(dpc))
+        return listed[dpc]
+
+    def previous_areas(dpc):  # areas a wildcard in the policy stood for
+        areas = listed_areas(dpc)
+        return None if areas is None else areas - changed_keys
+
+    def current_areas(dpc):
+        areas = listed_areas(dpc)
+        return None if areas is None else (areas | {k for k in added if dpc_of(k) == dpc}) - removed
+
+    policy_updated = False
+    for sid, template, needs_resource in PERMS_STATEMENTS:
+        stmt = next((s for s in policy['Statement'] if s.get('Sid') == sid), None)
+        new_resources = [area_resource(bucket_name, key) for key, perms in add if needs_resource(perms)]
+        if stmt is None:
+            if not new_resources:
+                continue
+            stmt = template()
+            policy['Statement'].append(stmt)
+
+        resources = stmt['Resource'] if isinstance(stmt['Resource'], list) else [stmt['Resource']]
+        kept = [res for res in expand_resources(bucket_name, resources, previous_areas)
+                if resource_key(bucket_name, res) not in changed_keys]
+        compacted = compact_resources(bucket_name, kept + new_resources, current_areas)
+
+        if compacted != resources:
+            policy_updated = True
+            if compacted:
+                stmt['Resource'] = compacted
+            else:  # a statement needs a resource
+                policy['Statement'].remove(stmt)
+    return policy_updated
+
+
+def policy_size(policy):
+    """Size of the policy as put, without whitespace."""
+    return len(json.dumps(policy, separators=(',', ':')).encode())
+
+
+def policy_headroom(policy):
+    """Bytes left in the policy before BUCKET_POLICY_MAX_SIZE."""
+    return BUCKET_POLICY_MAX_SIZE - policy_size(policy)
@@ -4,9 +4,12 @@ from datetime import date
 import requests
 
 from ait.commons.util.aws_client import Aws, static_bucket_name
+from ait.commons.util.command.compact_policy import CmdCompactPolicy
 from ait.commons.util.command.config import CmdConfig
 from ait.commons.util.command.create import CmdCreate
+from ait.commons.util.command.create_areas import CmdCreateAreas
 from ait.commons.util.command.delete import CmdDelete
+from ait.commons.util.command.delete_areas import CmdDeleteAreas
 from ait.commons.util.command.download import CmdDownload
 from ait.commons.util.command.list import CmdList
 from ait.commons.util.command.select import CmdSelect
@@ -85,6 +88,10 @@ class Cmd:
             success, msg = CmdCreate(self.aws, args).run()
             self.exit(success, msg)
 
+        elif args.command == 'create-areas':
+            success, msg = CmdCreateAreas(self.aws, args).run()
+            self.exit(success, msg)
+
         elif args.command == 'select':
             success, msg = CmdSelect(self.aws, args).run()
             self.exit(success, msg)
@@ -105,6 +112,14 @@ class Cmd:
             success, msg = CmdDelete(self.aws, args).run()
             self.exit(success, msg)
 
+        elif args.command == 'delete-areas':
+            success, msg = CmdDeleteAreas(self.aws, args).run()
+            self.exit(success, msg)
+
+        elif args.command == 'compact-policy':
+            success, msg = CmdCompactPolicy(self.aws, args).run()
+            self.exit(success, msg)
+
         elif args.command == 'sync':
             success, msg = CmdSync(self.aws, args).run()
             self.exit(success, msg)
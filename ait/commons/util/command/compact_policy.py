@@ -0,0 +1,48 @@
+import json
+
+from botocore.exceptions import ClientError
+
+from ait.commons.util.bucket_policy import BUCKET_POLICY_MAX_SIZE, add_manifest_access, policy_size, \
+    policy_headroom, update_area_perms
+from ait.commons.util.common import format_err
+
+
+class CmdCompactPolicy:
+    """
+    admin only
+    aws resource or client used in command - s3 client (list_objects_v2), s3 resource (BucketPolicy)
+    """
+
+    def __init__(self, aws, args):
+        self.aws = aws
+        self.args = args
+
+    def run(self):
+        if self.aws.is_user:
+            return False, 'You don\'t have permission to use this command'
+
+        try:
+            bucket_policy = self.aws.s3_resource().BucketPolicy(self.aws.bucket_name)
+            try:
+                policy_str = bucket_policy.policy  # throws NoSuchBucketPolicy
+            except ClientError:
+                policy_str = ''
+
+            if not policy_str:
+                return True, 'No bucket policy'
+
+            policy = json.loads(policy_str)
+            size = policy_size(policy)
+            # collapse the areas of every DPC in the policy sharing the same perms, dropping duplicates
+            policy_updated = update_area_perms(policy, self.aws.bucket_name, self.aws.list_prefixes, compact_all=True)
+            policy_updated = add_manifest_access(policy, self.aws.bucket_name) or policy_updated
+            if policy_updated:
+                bucket_policy.put(Policy=json.dumps(policy, separators=(',', ':')))
+                print(f'Bucket policy updated from {size} to {policy_size(policy)} bytes')
+
+            headroom = policy_headroom(policy)
+            return True, f'Bucket policy is {policy_size(policy)} of {BUCKET_POLICY_MAX_SIZE} bytes, ' \
+                         f'{headroom} bytes ({headroom * 100 // BUCKET_POLICY_MAX_SIZE}%) left'
+
+        except Exception as e:
+            return False, format_err(e, 'compact-policy')
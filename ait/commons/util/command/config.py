@@ -1,5 +1,6 @@
 from ait.commons.util.aws_cognito_authenticator import AwsCognitoAuthenticator
 from ait.commons.util.common import format_err
+from ait.commons.util.credential_cache import clear_cached_credentials
 from ait.commons.util.local_state import set_bucket
 from ait.commons.util.settings import DEFAULT_PROFILE
 
@@ -22,6 +23,9 @@ class CmdConfig:
                 set_bucket(self.args.bucket)
 
             if self.args.USERNAME and self.args.PASSWORD:
+                # credentials cached for the previous user of this profile no longer apply
+                clear_cached_credentials(profile)
+
                 aws_cognito_authenticator = AwsCognitoAuthenticator(self)
 
                 valid_user = aws_cognito_authenticator.validate_cognito_identity(profile, self.args.USERNAME,
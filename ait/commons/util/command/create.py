@@ -3,7 +3,7 @@ import json
 from botocore.exceptions import ClientError
 
 from ait.commons.util.aws_client import Aws
-from ait.commons.util.bucket_policy import DEFAULT_PERMS, allowDownloadStmt, denyDeleteStmt
+from ait.commons.util.bucket_policy import add_manifest_access, update_area_perms
 from ait.commons.util.common import format_err
 
 
@@ -30,59 +30,50 @@ class CmdCreate:
 
         try:
             s3_client = self.aws.common_session.client('s3')
-            # new upload areas to be created with tagging instead of metadata
-            # upload area format - morphic-DPC/area_name/
-            s3_client.put_object(Bucket=self.aws.bucket_name,
-                                 Key=('morphic-' + center_name.lower() + '/' + area_name + '/'),
-                                 Tagging=f'name={area_name}&perms={perms}')
-
-            if perms == DEFAULT_PERMS:
-                pass  # default perms as set in user policy (ux) applies - no need for further actions (deny or allow)
-            else:
-                # get bucket policy
-                bucket_policy = self.aws.common_session.resource('s3').BucketPolicy(self.aws.bucket_name)
-                try:
-                    policy_str = bucket_policy.policy
-                except ClientError:
-                    policy_str = ''
-
-                if policy_str:
-                    policy_json = json.loads(policy_str)
-                else:  # no bucket policy
-                    policy_json = json.loads('{ "Version": "2012-10-17", "Statement": [] }')
-
-                allow_stmt = None
-                deny_stmt = None
-
-                for stmt in policy_json['Statement']:
-                    if stmt['Sid'] == 'AllowDownload':
-                        allow_stmt = stmt
-                    elif stmt['Sid'] == 'DenyDelete':
-                        deny_stmt = stmt
-
-                if 'd' in perms:  # e.g 'ud' or 'udx'
-                    # allow download
-                    self.update_perms(policy_json, allow_stmt, allowDownloadStmt(), area_name)
-
-                if 'x' not in perms:  # e.g. 'u' or 'ud'
-                    # deny delete
-                    self.update_perms(policy_json, deny_stmt, denyDeleteStmt(), area_name)
-
-                try:
-                    bucket_policy.put(Policy=json.dumps(policy_json))
-                except ClientError:
-                    pass
+            key = create_area_marker(s3_client, self.aws.bucket_name, center_name, area_name, perms)
+            self.add_perms_to_bucket_policy([(key, perms)])
 
             return True, 'Created upload area with name ' + area_name + ' for ' + center_name + ' DPC'
 
         except Exception as e:
             return False, format_err(e, 'create')
 
-    def update_perms(self, policy, stmt, template, area):
-        if not stmt:
-            stmt = template
-            policy['Statement'].append(stmt)
-        if isinstance(stmt['Resource'], str):
-            stmt['Resource'] = [stmt['Resource']] + [f'arn:aws:s3:::{self.aws.bucket_name}/{area}/*']
-        elif isinstance(stmt['Resource'], list):
-            stmt['Resource'].append(f'arn:aws:s3:::{self.aws.bucket_name}/{area}/*')
+    def add_perms_to_bucket_policy(self, areas):
+        """
+        Add the perms of the areas, (area key, perms) pairs, to the bucket policy with a single read-modify-write,
+        compacted (see bucket_policy.update_area_perms).
+        Areas with the default perms (ux, as set in user policy) need no resource, but are still added so that
+        they are taken out of a DPC wildcard of their DPC, and the policy is only put if it changed.
+        The ManifestAccess statement is added with the first area.
+        """
+        # get bucket policy
+        bucket_policy = self.aws.s3_resource().BucketPolicy(self.aws.bucket_name)
+        try:
+            policy_str = bucket_policy.policy
+        except ClientError:
+            policy_str = ''
+
+        if policy_str:
+            policy_json = json.loads(policy_str)
+        else:  # no bucket policy
+            policy_json = json.loads('{ "Version": "2012-10-17", "Statement": [] }')
+
+        policy_updated = update_area_perms(policy_json, self.aws.bucket_name, self.aws.list_prefixes, add=areas)
+        policy_updated = add_manifest_access(policy_json, self.aws.bucket_name) or policy_updated
+        if policy_updated:
+            try:
+                bucket_policy.put(Policy=json.dumps(policy_json, separators=(',', ':')))
+            except ClientError:
+                pass
+
+
+def area_key(center_name, area_name):
+    # upload area format - morphic-DPC/area_name/
+    return 'morphic-' + center_name.lower() + '/' + area_name + '/'
+
+
+def create_area_marker(s3_client, bucket_name, center_name, area_name, perms):
+    # new upload areas to be created with tagging instead of metadata
+    key = area_key(center_name, area_name)
+    s3_client.put_object(Bucket=bucket_name, Key=key, Tagging=f'name={area_name}&perms={perms}')
+    return key
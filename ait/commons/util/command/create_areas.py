@@ -0,0 +1,98 @@
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from ait.commons.util.bucket_policy import ALLOWED_PERMS, DEFAULT_PERMS
+from ait.commons.util.command.create import CmdCreate, area_key, create_area_marker
+from ait.commons.util.common import format_err, is_valid_project_name
+from ait.commons.util.settings import METADATA_MAX_WORKERS
+
+
+def read_area_specs(path):
+    """
+    Areas to create from a JSON list of objects or a CSV with a header, each with a name, DPC and
+    optional perms (DEFAULT_PERMS if not set).
+    Returns a list of dicts with name, dpc and perms.
+    """
+    with open(path, 'r', newline='') as f:
+        if path.lower().endswith('.json'):
+            rows = json.load(f)
+            if not isinstance(rows, list):
+                raise ValueError(f'{path} is not a list of areas')
+        else:
+            rows = list(csv.DictReader(f, skipinitialspace=True))
+
+    specs = []
+    for row in rows:
+        row = {str(k).strip().lower(): str(v).strip() for k, v in row.items() if k is not None and v is not None}
+        specs.append(dict(name=row.get('name', ''), dpc=row.get('dpc', ''), perms=row.get('perms') or DEFAULT_PERMS))
+    return specs
+
+
+def invalid_area_specs(specs):
+    """Messages for the specs with an invalid name, DPC or perms, or creating the same area twice."""
+    errors = []
+    keys = set()
+    for i, spec in enumerate(specs, start=1):
+        if not is_valid_project_name(spec['name']) or not is_valid_project_name(spec['dpc']):
+            errors.append(f'area {i}: invalid name or DPC - needs to be between 1-36 alphanumeric characters '
+                          f'with no space')
+        elif spec['perms'] not in ALLOWED_PERMS:
+            errors.append(f'area {i}: invalid perms {spec["perms"]} - one of {", ".join(ALLOWED_PERMS)}')
+        elif area_key(spec['dpc'], spec['name']) in keys:
+            errors.append(f'area {i}: {spec["name"]} for {spec["dpc"]} DPC listed more than once')
+        else:
+            keys.add(area_key(spec['dpc'], spec['name']))
+    return errors
+
+
+class CmdCreateAreas(CmdCreate):
+    """
+    admin only
+    aws resource or client used in command - s3 client (put_object), s3 resource (BucketPolicy)
+    """
+
+    def run(self):
+        if not self.aws:
+            return False, 'You need configure your profile first'
+
+        if self.aws.is_user:
+            return False, 'You don\'t have permission to use this command'
+
+        try:
+            specs = read_area_specs(self.args.FILE)
+            errors = invalid_area_specs(specs)
+            if errors:
+                return False, '\n'.join(errors)
+            if not specs:
+                return False, 'No area specified'
+
+            # area markers created concurrently with the shared client
+            s3_client = self.aws.s3_client()
+
+            def create(spec):
+                try:
+                    return spec, create_area_marker(s3_client, self.aws.bucket_name, spec['dpc'], spec['name'],
+                                                    spec['perms']), None
+                except Exception as e:
+                    return spec, None, e
+
+            created = []
+            with ThreadPoolExecutor(max_workers=METADATA_MAX_WORKERS) as executor:
+                for spec, key, ex in executor.map(create, specs):
+                    if ex:
+                        print(f'Failed to create upload area with name {spec["name"]} for {spec["dpc"]} DPC. '
+                              f'{format_err(ex, "create")}')
+                    else:
+                        created.append((key, spec['perms']))
+                        print(f'Created upload area with name {spec["name"]} for {spec["dpc"]} DPC')
+
+            # perms of all the areas created merged into the bucket policy at once
+            self.add_perms_to_bucket_policy(created)
+
+            if len(created) < len(specs):
+                return False, f'{len(specs) - len(created)} of {len(specs)} upload area(s) not created'
+            return True, f'{len(created)} upload area(s) created'
+
+        except Exception as e:
+            return False, format_err(e, 'create-areas')
@@ -2,6 +2,7 @@ import json
 
 from botocore.exceptions import ClientError
 
+from ait.commons.util.batch_delete import delete_keys
 from ait.commons.util.command.area import CmdArea
 from ait.commons.util.common import format_err
 from ait.commons.util.local_state import get_selected_area
@@ -16,7 +17,7 @@ if an object key is specified e.g. abc.txt, current behaviour is deleting all ob
 class CmdDelete:
     """
     both admin and user, though user can't delete folder
-    aws resource or client used in command - s3 resource (bucket.objects/ obj.delete)
+    aws resource or client used in command - s3 client (list_objects_v2, delete_objects in batches)
     """
 
     def __init__(self, aws, args):
@@ -72,19 +73,13 @@ class CmdDelete:
                     # so use obj_exists
 
                     prefix = selected_area + p
-                    keys = self.all_keys(prefix)
-
-                    if keys:
-                        for k in keys:
-                            try:
-                                self.delete_s3_object(k)
-                                print(k + '  Done.')
-                            except Exception as ex:
-                                if 'AccessDenied' in str(ex):
-                                    print('No permission to delete.')
-                                else:
-                                    print('Delete failed.')
-                    else:
+
+                    # keys streamed from the listing pages into the batched deletes
+                    found = False
+                    for k, error in delete_keys(self.aws, self.all_keys(prefix)):
+                        found = True
+                        print(k + '  ' + delete_status(error))
+                    if not found:
                         print(prefix + '  File not found.')
                 return True, None
             else:
@@ -93,74 +88,94 @@ class CmdDelete:
         except Exception as e:
             return False, format_err(e, 'delete')
 
-    # based on obj_exists method
     def all_keys(self, prefix):
-        keys = []
-        response = self.aws.common_session.client('s3').list_objects_v2(
-            Bucket=self.aws.bucket_name,
-            Prefix=prefix,
-        )
-        for obj in response.get('Contents', []):
-            keys.append(obj['Key'])
-            
-        return keys
-
-    def delete_s3_object(self, key):
-        s3_resource = self.aws.common_session.resource('s3')
-        s3_obj = s3_resource.ObjectSummary(self.aws.bucket_name, key)
-        s3_obj.delete()
-        return key
+        """Generator of the keys under prefix, following the listing pagination."""
+        for obj in self.aws.list_objects(prefix):
+            yield obj['Key']
 
     def delete_upload_area(self, selected_area, incl_selected_area=False):
-        s3_resource = self.aws.common_session.resource('s3')
-        bucket = s3_resource.Bucket(self.aws.bucket_name)
+        """
+        Delete the objects of the area in batches as they are listed, the area itself only if incl_selected_area.
+        Keys that couldn't be deleted are printed. Returns the deleted keys.
+        """
+        keys = (obj['Key'] for obj in self.aws.list_objects(selected_area)
+                if incl_selected_area or obj['Key'] != selected_area)
         deleted_keys = []
-        objs_to_delete = bucket.objects.filter(Prefix=selected_area) if incl_selected_area else filter(lambda obj: obj.key != selected_area, bucket.objects.filter(Prefix=selected_area))
-        for obj in objs_to_delete:
-            obj.delete()
-            deleted_keys.append(obj.key)
+        for k, error in delete_keys(self.aws, keys):
+            if error:
+                print(k + '  ' + delete_status(error))
+            else:
+                deleted_keys.append(k)
 
         return deleted_keys
 
     def clear_area_perms_from_bucket_policy(self, selected_area):
-        s3_resource = self.aws.common_session.resource('s3')
+        s3_resource = self.aws.s3_resource()
         return CmdDelete.delete_dir_perms_from_bucket_policy(s3_resource, self.aws.bucket_name, selected_area)
 
     @staticmethod
     def delete_dir_perms_from_bucket_policy(s3_res, bucket_name, area_name):
+        return CmdDelete.delete_areas_perms_from_bucket_policy(s3_res, bucket_name, [area_name])
+
+    @staticmethod
+    def delete_areas_perms_from_bucket_policy(s3_res, bucket_name, area_names):
+        """
+        Remove the resources of all the areas from the bucket policy with a single read-modify-write,
+        and the statements left without resources. Returns True if the policy was updated.
+        DPC wildcards are kept, they stand for the remaining areas of the DPC, which share their perms.
+        """
         bucket_policy = s3_res.BucketPolicy(bucket_name)
         try:
-            policy_str = bucket_policy.policy # throws NoSuchBucketPolicy
+            policy_str = bucket_policy.policy  # throws NoSuchBucketPolicy
         except ClientError:
-            policy_str = ''
+            return False
+
+        if not policy_str or not area_names:
+            return False
+
+        def in_areas(res):
+            return any(area_name in res for area_name in area_names)
+
+        # remove any statement affecting single resource
+        # (this also maintains backward compatibility with the previous way of adding
+        # a statement per upload area), and the resources of the areas from resource lists
+        policy = json.loads(policy_str)
+        statements = []
+        policy_updated = False
+        for stmt in policy['Statement']:
+            if isinstance(stmt['Resource'], str):
+                if in_areas(stmt['Resource']):
+                    policy_updated = True
+                    continue
+            elif isinstance(stmt['Resource'], list):
+                resources = [res for res in stmt['Resource'] if not in_areas(res)]
+                if len(resources) != len(stmt['Resource']):
+                    policy_updated = True
+                    stmt['Resource'] = resources
+                    if not resources:
+                        continue  # a statement needs a resource
+            statements.append(stmt)
 
-        if policy_str:
-            policy = json.loads(policy_str)
-            policy_updated = False
+        if policy_updated:
+            policy['Statement'] = statements
+            CmdDelete.put_bucket_policy(bucket_policy, policy)
+        return policy_updated
 
-            # remove any statement affecting single resource
-            # (this also maintains backward compatibility with the previous way of adding
-            # a statement per upload area)
-            for stmt in policy['Statement']:
+    @staticmethod
+    def put_bucket_policy(bucket_policy, policy):
+        try:
+            if policy['Statement']:
+                bucket_policy.put(Policy=json.dumps(policy, separators=(',', ':')))  # throws MalformedPolicy (policy document exceeds the maximum allowed size of 20480 bytes)
+            else:
+                bucket_policy.delete()
+        except ClientError:
+            pass
 
-                if isinstance(stmt['Resource'], str) and area_name in stmt['Resource']:
-                    policy_updated = True
-                    policy['Statement'].remove(stmt) # cannot modify if removing item while iterating over list
-
-            # now check statement with resource list
-            for stmt in policy['Statement']:            
-                if isinstance(stmt['Resource'], list):
-                    # remove resource from resource list of statement but not statement
-                    for res in stmt['Resource']:
-                        if area_name in res:
-                            policy_updated = True
-                            stmt['Resource'].remove(res)
-
-            if policy_updated:
-                try:
-                    if policy['Statement']:
-                        bucket_policy.put(Policy=json.dumps(policy))  # throws MalformedPolicy (policy document exceeds the maximum allowed size of 20480 bytes)
-                    else:
-                        bucket_policy.delete()
-                except ClientError:
-                    pass
+
+def delete_status(error):
+    """Message for the result of a key deletion, error the error code of the batch response."""
+    if not error:
+        return 'Done.'
+    if error == 'AccessDenied':
+        return 'No permission to delete.'
+    return 'Delete failed.'
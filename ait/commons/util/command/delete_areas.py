@@ -0,0 +1,119 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ait.commons.util.batch_delete import delete_keys
+from ait.commons.util.command.area import CmdArea
+from ait.commons.util.command.delete import CmdDelete, delete_status
+from ait.commons.util.common import format_err, is_valid_uuid
+from ait.commons.util.local_state import get_selected_area
+from ait.commons.util.settings import AREA_DELETE_MAX_WORKERS
+
+
+def read_areas(path):
+    """Areas listed in the file, one per line, skipping blank lines and # comments."""
+    with open(path, 'r') as f:
+        lines = (line.strip() for line in f)
+        return [line for line in lines if line and not line.startswith('#')]
+
+
+def area_key(area):
+    return area if area.endswith('/') else f'{area}/'
+
+
+def is_area_key(key):
+    """
+    True for the key of an area, morphic-DPC/name/ or a UUID area - never a DPC, whose prefix
+    would take all its areas with it.
+    """
+    parts = key.split('/')
+    if parts[-1] or not all(parts[:-1]):
+        return False
+    if len(parts) == 2:
+        return is_valid_uuid(parts[0])
+    return len(parts) == 3 and parts[0].startswith('morphic-') and len(parts[0]) > len('morphic-')
+
+
+class CmdDeleteAreas:
+    """
+    admin only
+    aws resource or client used in command - s3 client (list_objects_v2, delete_objects), s3 resource (BucketPolicy)
+    """
+
+    def __init__(self, aws, args):
+        self.aws = aws
+        self.args = args
+
+    def run(self):
+        if self.aws.is_user:
+            return False, 'You don\'t have permission to use this command'
+
+        areas = list(self.args.AREA or [])
+        if self.args.f:
+            areas += read_areas(self.args.f)
+        # keys of the areas, in the order given, without duplicates
+        areas = list(dict.fromkeys(area_key(area) for area in areas))
+
+        if not areas:
+            return False, 'No area specified'
+
+        invalid_areas = [area for area in areas if not is_area_key(area)]
+        if invalid_areas:
+            return False, '\n'.join(f'{area}  Not an upload area - morphic-DPC/name or UUID.'
+                                    for area in invalid_areas)
+
+        confirm = input(f'Confirm delete {len(areas)} upload area(s) and their contents? Y/y to proceed: ')
+        if confirm.lower() != 'y':
+            return True, None
+
+        try:
+            print('Deleting...')
+            deleted_areas = []
+            with ThreadPoolExecutor(max_workers=AREA_DELETE_MAX_WORKERS) as executor:
+                futures = [executor.submit(self.delete_area, area) for area in areas]
+                for future in as_completed(futures):
+                    area, deleted_count, failed_keys, ex = future.result()
+                    for k, error in failed_keys:
+                        print(k + '  ' + delete_status(error))
+                    if ex:
+                        print(f'{area}  Delete failed. {deleted_count} file(s) deleted. '
+                              f'{format_err(ex, "delete-areas")}')
+                    elif not deleted_count and not failed_keys:
+                        print(area + '  Upload area does not exist.')
+                    elif failed_keys:
+                        print(f'{area}  Delete failed. {deleted_count} file(s) deleted, {len(failed_keys)} left.')
+                    else:
+                        deleted_areas.append(area)
+                        print(f'{area}  Done. {deleted_count} file(s) deleted.')
+
+            # perms of the areas removed from the bucket policy in a single update, only for the areas
+            # deleted completely - the perms still apply to what is left of the others
+            s3_resource = self.aws.s3_resource()
+            CmdDelete.delete_areas_perms_from_bucket_policy(s3_resource, self.aws.bucket_name, deleted_areas)
+
+            if get_selected_area() in deleted_areas:
+                CmdArea.clear(False)
+
+            if len(deleted_areas) < len(areas):
+                return False, f'{len(areas) - len(deleted_areas)} of {len(areas)} upload area(s) not deleted'
+            return True, f'{len(deleted_areas)} upload area(s) deleted'
+
+        except Exception as e:
+            return False, format_err(e, 'delete-areas')
+
+    def delete_area(self, area):
+        """
+        Delete the objects of the area, the area itself included, in batches as they are listed.
+        Returns (area, deleted count, [(key, error code)] of the keys not deleted, exception if the listing
+        or deleting failed), a failure only of this area so the others are still cleaned up.
+        """
+        deleted_count = 0
+        failed_keys = []
+        try:
+            keys = (obj['Key'] for obj in self.aws.list_objects(area))
+            for k, error in delete_keys(self.aws, keys):
+                if error:
+                    failed_keys.append((k, error))
+                else:
+                    deleted_count += 1
+        except Exception as e:
+            return area, deleted_count, failed_keys, e
+        return area, deleted_count, failed_keys, None
@@ -1,10 +1,19 @@
+import hashlib
 import os
+from contextlib import suppress
 
 import botocore
 
-from ait.commons.util.common import format_err
+from ait.commons.util.aws_client import etag_md5
+from ait.commons.util.common import format_err, compute_md5, HASH_CHUNK_SIZE
 from ait.commons.util.file_transfer import FileTransfer, TransferProgress, transfer
+from ait.commons.util.hash_cache import cached_md5, get_hash_cache
 from ait.commons.util.local_state import get_selected_area
+from ait.commons.util.manifest import Manifest, is_manifest
+from ait.commons.util.part_file import PartFile, PART_SUFFIX
+from ait.commons.util.progress import Progress
+from ait.commons.util.transfer_config import get_chunk_size, MULTIPART_THRESHOLD
+from ait.commons.util.transfer_scheduler import get_transfer_scheduler, TransferScheduler
 
 
 class CmdDownload:
@@ -17,6 +26,130 @@ class CmdDownload:
         self.aws = aws
         self.args = args
         self.files = []
+        # files are queued to a bounded pool of workers, of the requested size or the shared one
+        self.scheduler = TransferScheduler(max_workers=args.workers) if args.workers else get_transfer_scheduler()
+        self.progress = Progress('Downloading', enabled=not args.no_progress)
+        self.manifest = None  # checksum manifest of the selected area
+
+    def is_unchanged(self, f):
+        """
+        True if the local file has the size and md5 of the object. The local md5 is only computed (or taken
+        from the hash cache) when the sizes match, and the remote md5 is taken from the ETag when it is one,
+        otherwise from the area manifest or, failing that, the md5 metadata written on upload.
+        """
+        if not os.path.isfile(f.key) or os.path.getsize(f.key) != f.size:
+            return False
+
+        remote_md5 = etag_md5(f.etag) or (self.manifest and self.manifest.md5(f.key, f.size, f.last_modified)) \
+            or self.aws.get_md5_metadata(f.key)
+        if remote_md5 is None:
+            return False
+
+        return remote_md5 == cached_md5(f.key)
+
+    def download_file_verified(self, f, callback):
+        """
+        Download the object with a streamed GET, hashing each chunk as it is written to a part file, which is
+        renamed into place if its md5 matches the md5 metadata of the object (or its ETag when it is an MD5).
+        """
+        part_path = f.key + PART_SUFFIX
+        hash_md5 = hashlib.md5()
+
+        # the connection is held until the body is read
+        with self.scheduler.connections(1):
+            resp = self.aws.s3_client().get_object(Bucket=self.aws.bucket_name, Key=f.key)
+            expected_md5 = resp.get('Metadata', {}).get('md5') or etag_md5(resp.get('ETag'))
+
+            try:
+                with open(part_path, 'wb') as out:
+                    for chunk in resp['Body'].iter_chunks(HASH_CHUNK_SIZE):
+                        out.write(chunk)
+                        hash_md5.update(chunk)
+                        callback(len(chunk))
+                if expected_md5 and hash_md5.hexdigest() != expected_md5:
+                    raise Exception(f'md5 of {f.key} does not match the uploaded file')
+            except Exception:
+                # the part file is not there if it couldn't be opened
+                with suppress(FileNotFoundError):
+                    os.remove(part_path)
+                raise
+
+        if not expected_md5:
+            self.progress.write(f'{f.key} has no md5 to be verified against')
+
+        os.replace(part_path, f.key)
+        get_hash_cache().put(os.path.abspath(f.key), os.stat(f.key), hash_md5.hexdigest())
+
+    def download_file_ranged(self, f, callback):
+        """
+        Download a large object with ranged GETs of its parts, spread over the part workers of the scheduler,
+        to a part file that is resumed if an earlier download of the same object was interrupted.
+        The file is verified against the md5 metadata of the object before it's renamed into place, and only
+        renamed with a warning if the object has none.
+        """
+        s3_client = self.aws.s3_client()
+        bucket = self.aws.bucket_name
+        head = s3_client.head_object(Bucket=bucket, Key=f.key)
+
+        part_file = PartFile(f.key, head['ETag'], head['ContentLength'], get_chunk_size(head['ContentLength']))
+        completed_parts = part_file.open()
+
+        for part_number in completed_parts:
+            first, last = part_file.part_range(part_number)
+            callback(last - first + 1)
+
+        def download_part(part_number):
+            first, last = part_file.part_range(part_number)
+            # IfMatch fails the part if the object was replaced since the download started
+            resp = s3_client.get_object(Bucket=bucket, Key=f.key, Range=f'bytes={first}-{last}', IfMatch=part_file.etag)
+            part_file.write(part_number, resp['Body'], callback)
+
+        missing_parts = [n for n in range(1, part_file.part_count + 1) if n not in completed_parts]
+        part_futures = [self.scheduler.submit_part(download_part, n) for n in missing_parts]
+        try:
+            for part_future in part_futures:
+                part_future.result()
+        finally:
+            for part_future in part_futures:
+                part_future.cancel()
+
+        # the parts land out of order, so the file is hashed once complete, only if there is an md5 to compare
+        md5 = head.get('Metadata', {}).get('md5')
+        if not md5:
+            self.progress.write(f'{f.key} has no md5 to be verified against')
+            part_file.commit()
+            return
+
+        if compute_md5(part_file.part_path) != md5:
+            part_file.discard()
+            raise Exception(f'md5 of {f.key} does not match the uploaded file')
+
+        part_file.commit()
+        get_hash_cache().put(os.path.abspath(f.key), os.stat(f.key), md5)
+
+    def resolve_files(self, keys):
+        """
+        FileTransfer of each requested key, in order, from HEADs run concurrently by the file workers
+        of the scheduler. Keys not found, forbidden or failing otherwise are complete with their status.
+        """
+        def resolve(key):
+            try:
+                # if you're able to download (s3:GetObject) you can do HEAD Object
+                head = self.aws.s3_client().head_object(Bucket=self.aws.bucket_name, Key=key)
+            except botocore.exceptions.ClientError as e:
+                if e.response['Error']['Code'] == "404":
+                    return FileTransfer(path=os.getcwd(), key=key, status='File not found.', complete=True)
+                elif e.response['Error']['Code'] == "403":
+                    # An error occurred (403) when calling the HeadObject operation: Forbidden
+                    return FileTransfer(path=os.getcwd(), key=key, status='Access denied.', complete=True)
+                else:
+                    # Something else has gone wrong.
+                    return FileTransfer(path=os.getcwd(), key=key, status='Download error.', complete=True)
+            last_modified = head['LastModified'].timestamp() if 'LastModified' in head else None
+            return FileTransfer(path=os.getcwd(), key=key, size=head['ContentLength'], etag=head.get('ETag'),
+                                last_modified=last_modified)
+
+        return list(self.scheduler.executor.map(resolve, keys))
 
     def run(self):
 
@@ -29,8 +162,9 @@ class CmdDownload:
             return False, 'No area selected'
 
         try:
-            s3_resource = self.aws.common_session.resource('s3')
+            s3_resource = self.aws.s3_resource()
             bucket = s3_resource.Bucket(self.aws.bucket_name)
+            self.manifest = Manifest(self.aws, selected_area)
 
             # choice 1
             all_files = self.args.a  # optional bool
@@ -39,49 +173,40 @@ class CmdDownload:
             if all_files:
                 # download all files from selected area
                 for obj in bucket.objects.filter(Prefix=selected_area):
-                    # skip the top-level directory
-                    if obj.key == selected_area:
+                    # skip the top-level directory and the checksum manifest
+                    if obj.key == selected_area or is_manifest(obj.key):
                         continue
-                    fs.append(FileTransfer(path=os.getcwd(), key=obj.key, size=obj.size))
+                    fs.append(FileTransfer(path=os.getcwd(), key=obj.key, size=obj.size, etag=obj.e_tag,
+                                           last_modified=obj.last_modified.timestamp()))
             else:
                 # choice 2
                 # download specified file(s) only
 
-                for f in self.args.f:
-                    # check if f exists
-                    key = f'{selected_area}{f}'
-                    try:
-                        # if you're able to download (s3:GetObject) you can do HEAD Object which
-                        # is used by resource.ObjectSummary
-                        obj_summary = s3_resource.ObjectSummary(self.aws.bucket_name, key)
-                        obj_size = obj_summary.size
-                    except botocore.exceptions.ClientError as e:
-                        if e.response['Error']['Code'] == "404":
-                            fs.append(FileTransfer(path=os.getcwd(), key=key, status='File not found.', complete=True))
-                        elif e.response['Error']['Code'] == "403":
-                            # An error occurred (403) when calling the HeadObject operation: Forbidden
-                            fs.append(FileTransfer(path=os.getcwd(), key=key, status='Access denied.', complete=True))
-                        else:
-                            # Something else has gone wrong.
-                            fs.append(FileTransfer(path=os.getcwd(), key=key, status='Download error.', complete=True))
-                    else:
-                        fs.append(FileTransfer(path=os.getcwd(), key=key, size=obj_size))
+                fs = self.resolve_files([f'{selected_area}{f}' for f in self.args.f])
 
             def download(idx):
                 try:
                     file = fs[idx].key
                     os.makedirs(os.path.dirname(file), exist_ok=True)
 
-                    s3 = self.aws.new_session().resource('s3')
-                    s3.Bucket(self.aws.bucket_name).download_file(file, file, Callback=TransferProgress(fs[idx]))
+                    if self.args.skip_existing and self.is_unchanged(fs[idx]):
+                        fs[idx].status = 'Unchanged.'
+                    elif fs[idx].size >= MULTIPART_THRESHOLD:
+                        self.download_file_ranged(fs[idx], TransferProgress(fs[idx]))
+                    elif self.args.verify:
+                        self.download_file_verified(fs[idx], TransferProgress(fs[idx]))
+                    else:
+                        config = self.scheduler.transfer_config(fs[idx].size, file_count)
+                        with self.scheduler.connections_for(config):
+                            self.aws.s3_client().download_file(self.aws.bucket_name, file, file,
+                                                               Callback=TransferProgress(fs[idx]), Config=config)
 
                     # if file size is 0, callback will likely never be called
                     # and complete will not change to True
-                    # hack
                     if fs[idx].size == 0:
                         fs[idx].status = 'Empty file.'
-                        fs[idx].complete = True
-                        fs[idx].successful = True
+                    fs[idx].complete = True
+                    fs[idx].successful = True
 
                 except Exception as thread_ex:
                     if 'Forbidden' in str(thread_ex) or 'AccessDenied' in str(thread_ex):
@@ -91,13 +216,19 @@ class CmdDownload:
                     fs[idx].complete = True
                     fs[idx].successful = False
 
+            file_count = len([f for f in fs if not f.complete])
+
             print('Downloading...')
 
-            transfer(download, fs)
+            failed = transfer(download, fs, self.progress, self.scheduler)
 
             self.files = [f for f in fs if f.successful]
 
-            if all([f.successful for f in fs]):
+            # per file results of the files not downloaded
+            for f in failed:
+                print(f'{f.key}  {f.status}')
+
+            if not failed:
                 return True, 'Successful download.'
             else:
                 return False, 'Failed download.'
@@ -1,5 +1,14 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 from ait.commons.util.common import format_err
 from ait.commons.util.local_state import get_selected_area
+from ait.commons.util.manifest import Manifest, is_manifest
+from ait.commons.util.settings import METADATA_MAX_WORKERS
+
+# md5 lookups in flight ahead of the output - a listing page
+LIST_LOOKAHEAD = 1000
 
 
 class CmdList:
@@ -12,7 +21,8 @@ class CmdList:
         self.aws = aws
         self.args = args
 
-        self.s3_cli = self.aws.common_session.client('s3')
+        # shared client, whose connection pool is sized for the concurrent lookups
+        self.s3_cli = self.aws.s3_client()
 
     def run(self):
 
@@ -52,14 +62,15 @@ class CmdList:
                 n, p = self.get_name_and_perms(selected_area)
                 self.print_area(selected_area, dict(name=n, perms=p))
 
+                # printed as the listing pages and md5 lookups complete, counted as printed
                 file_count = 0
-                contents = self.list_area_contents(selected_area)
-
-                for item in contents:
+                for item in self.list_area_contents(selected_area):
                     key = item['key']
-                    hash_md5 = item['md5']
 
-                    print(f"{key} - {hash_md5}")
+                    if self.args.fast:
+                        print(f"{key} {item['size']} {item['etag']}")
+                    else:
+                        print(f"{key} - {item['md5']}")
                     if not key.endswith('/'):
                         file_count += 1
 
@@ -100,30 +111,58 @@ class CmdList:
         return n, p
 
     def list_bucket_areas(self):
-        areas = []
-        result = self.s3_cli.list_objects_v2(Bucket=self.aws.bucket_name, Delimiter='/')
-        dirs = result.get('CommonPrefixes', [])
-        for d in dirs:
-            k = d.get('Prefix')
-            n, p = self.get_name_and_perms(k)
-            areas.append(dict(key=k, name=n, perms=p))
-        return areas
+        """Generator of the areas with their name and perms, looked up concurrently, in listing order."""
+        with ThreadPoolExecutor(max_workers=METADATA_MAX_WORKERS) as executor:
+            for k, (n, p) in ordered_lookups(executor, self.get_name_and_perms, self.aws.list_prefixes('')):
+                yield dict(key=k, name=n, perms=p)
+
+    def get_md5(self, manifest, obj):
+        """md5 of the listed object from the area manifest, otherwise from its metadata (a HEAD)."""
+        last_modified = obj['LastModified'].timestamp() if 'LastModified' in obj else None
+        hash_md5 = manifest.md5(obj['Key'], obj['Size'], last_modified)
+        if hash_md5:
+            return hash_md5
+
+        head_object_response = self.s3_cli.head_object(Bucket=self.aws.bucket_name, Key=obj['Key'])
+        metadata = head_object_response.get('Metadata', {})
+        return metadata.get('md5', 'MD5 checksum not found')
 
     def list_area_contents(self, selected_area):
-        contents = []
-
-        s3_resource = self.aws.common_session.resource('s3')
-        bucket = s3_resource.Bucket(self.aws.bucket_name)
-
-        for obj in bucket.objects.filter(Prefix=selected_area):
-            k = obj.key
-            if k != selected_area:
-                head_object_response = self.s3_cli.head_object(Bucket=self.aws.bucket_name, Key=k)
-                metadata = head_object_response.get('Metadata', {})
-                hash_md5 = metadata.get('md5', 'MD5 checksum not found')
-                contents.append({'key': k, 'md5': hash_md5})
-
-        return contents
+        """
+        Generator of the objects of the area with their md5, in listing order, as the listing pages arrive.
+        The md5s are read from the area manifest, and only the objects missing from it are looked up,
+        concurrently by a bounded pool. In fast mode, the sizes and ETags of the listing.
+        """
+        objs = (obj for obj in self.aws.list_objects(selected_area)
+                if obj['Key'] != selected_area and not is_manifest(obj['Key']))
+
+        if self.args.fast:
+            for obj in objs:
+                yield {'key': obj['Key'], 'size': obj['Size'], 'etag': obj['ETag']}
+            return
+
+        manifest = Manifest(self.aws, selected_area)
+        manifest.load()
+        with ThreadPoolExecutor(max_workers=METADATA_MAX_WORKERS) as executor:
+            for obj, hash_md5 in ordered_lookups(executor, partial(self.get_md5, manifest), objs):
+                yield {'key': obj['Key'], 'md5': hash_md5}
+
+
+def ordered_lookups(executor, lookup, items):
+    """
+    Generator of (item, lookup(item)) in the order of items, with the lookups run by executor as items
+    are generated and yielded as soon as the lookups before them are done. At most LIST_LOOKAHEAD
+    lookups are in flight ahead of the output.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(lookup, item)))
+        while pending and (pending[0][1].done() or len(pending) >= LIST_LOOKAHEAD):
+            item, future = pending.popleft()
+            yield item, future.result()
+
+    for item, future in pending:
+        yield item, future.result()
 
 
 def print_count(count):
@@ -1,15 +1,15 @@
 import os
-from tqdm import tqdm
-from multiprocessing import cpu_count
-from multiprocessing.pool import ThreadPool
+import concurrent.futures
 
 from botocore.exceptions import ClientError
-from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 
 from ait.commons.util.aws_client import Aws
 from ait.commons.util.common import gen_uuid, format_err, INGEST_UPLOAD_AREA_PREFIX
 from ait.commons.util.local_state import get_selected_area
+from ait.commons.util.manifest import is_manifest
+from ait.commons.util.progress import Progress
+from ait.commons.util.transfer_scheduler import get_transfer_scheduler
 from ait.commons.util.upload_service import notify_upload
 
 
@@ -44,19 +44,19 @@ class CmdSync:
             bucket = s3_res.Bucket(self.aws.bucket_name)
 
             fs = []
-            total_size = 0
 
             # get all files from selected area
             for obj in bucket.objects.filter(Prefix=selected_area):
-                # skip the top-level directory
-                if obj.key == selected_area:
+                # skip the top-level directory and the checksum manifest
+                if obj.key == selected_area or is_manifest(obj.key):
                     continue
-                total_size += obj.size
                 fs.append(obj)
 
             failed_fs = []
             
             def transfer(f):
+                # registered with the progress once started, queued files are only counted in its totals
+                file_progress = progress.add(f.key, f.size, expected=True)
                 try:
                     
                     fname = f.key[37:]
@@ -73,13 +73,15 @@ class CmdSync:
                     }
                     dest_key = dest_upload_area_uuid + '/' + fname
 
-                    s3_cli.copy(copy_source, dest_bucket, dest_key,
-                                    Callback=pbar.update, 
-                                    ExtraArgs={
-                                        'ContentType': content_type,
-                                        'MetadataDirective': 'REPLACE',
-                                        },
-                                    Config=get_transfer_config(f.size))
+                    config = scheduler.transfer_config(f.size, len(fs))
+                    with scheduler.connections_for(config):
+                        s3_cli.copy(copy_source, dest_bucket, dest_key,
+                                        Callback=file_progress,
+                                        ExtraArgs={
+                                            'ContentType': content_type,
+                                            'MetadataDirective': 'REPLACE',
+                                            },
+                                        Config=config)
 
                     if not notify_upload(dest_env, dest_upload_area_uuid, fname):
                         failed_fs.append((f, 'Transferred. Notify failed.'))
@@ -95,13 +97,19 @@ class CmdSync:
                     failed_fs.append((f, str(thread_ex)))
                     pass
 
-            print('Transferring...')
-            pbar = tqdm(total=total_size, unit='B', unit_scale=True, desc=num_files(fs))
-            pool = ThreadPool() # cpu_count() DEFAULT_THREAD_COUNT=25
-            pool.map_async(transfer, fs)
-            pool.close()
-            pool.join()
-            pbar.close()
+                finally:
+                    file_progress.done()
+
+            scheduler = get_transfer_scheduler()
+
+            print(f'Transferring {num_files(fs)}...')
+            progress = Progress('Transferring', enabled=not self.args.no_progress)
+            futures = []
+            for f in fs:
+                progress.expect(f.size)
+                futures.append(scheduler.submit(transfer, f))
+            with progress:
+                concurrent.futures.wait(futures)
 
             if failed_fs:
                 print(f'{num_files(failed_fs)} failed to transfer: ')
@@ -118,26 +126,3 @@ class CmdSync:
 def num_files(ls):
     l = len(ls)
     return f'{l} file{"s" if l > 1 else ""}'
-
-
-# this is based on the dcplib s3_multipart module
-KB = 1024
-MB = KB * KB
-MIN_CHUNK_SIZE = 64 * MB
-MULTIPART_THRESHOLD = MIN_CHUNK_SIZE + 1
-MAX_MULTIPART_COUNT = 10000 # s3 imposed
-
-
-def get_transfer_config(filesize):
-    return TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, 
-                          multipart_chunksize=get_chunk_size(filesize))
-
-
-def get_chunk_size(filesize):
-    if filesize <= MAX_MULTIPART_COUNT * MIN_CHUNK_SIZE:
-        return MIN_CHUNK_SIZE
-    else:
-        div = filesize // MAX_MULTIPART_COUNT
-        if div * MAX_MULTIPART_COUNT < filesize:
-            div += 1
-        return ((div + MB - 1) // MB) * MB
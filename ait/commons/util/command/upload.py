@@ -1,23 +1,102 @@
 import hashlib
 import os
+import threading
+from functools import partial
+
 import filetype
+from botocore.exceptions import ClientError
 
-from ait.commons.util.settings import DIR_SUPPORT, MAX_DIR_DEPTH
+from ait.commons.util.settings import DIR_SUPPORT, MAX_DIR_DEPTH, TRANSFER_MAX_WORKERS, HASH_MAX_WORKERS, \
+    UPLOAD_QUEUE_SIZE
+from ait.commons.util.transfer_config import get_chunk_size, MULTIPART_THRESHOLD
 from ait.commons.util.common import format_err
+from ait.commons.util.hash_cache import cached_md5, get_hash_cache
 from ait.commons.util.local_state import get_selected_area
-import concurrent.futures
+from ait.commons.util.manifest import Manifest, DENIED_CODES
 from concurrent.futures import ThreadPoolExecutor
-from ait.commons.util.progress_bar import ProgressBar
+from ait.commons.util.progress import Progress
+from ait.commons.util.transfer_journal import JournalEntry, get_transfer_journal
+from ait.commons.util.transfer_scheduler import get_transfer_scheduler
+
+# filetype only inspects the header signature of a file
+FILETYPE_HEADER_SIZE = 262
+
+
+class HashingReader:
+    """
+    Non-seekable reader over an open file which computes the MD5 of the bytes read.
+    As it can't seek, boto reads it sequentially part after part, so the file is hashed
+    while it is streamed and each byte is read from disk only once.
+    """
+
+    def __init__(self, f, head=b''):
+        self._f = f
+        self._head = head  # bytes already read from f, returned first
+        self._md5 = hashlib.md5()
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            data = self._head + self._f.read()
+            self._head = b''
+        elif self._head:
+            data = self._head[:size]
+            self._head = self._head[size:]
+            if len(data) < size:
+                data += self._f.read(size - len(data))
+        else:
+            data = self._f.read(size)
+        self._md5.update(data)
+        return data
 
+    def hexdigest(self):
+        return self._md5.hexdigest()
 
-def compute_md5(file_path):
-    """Compute the MD5 hash of the file."""
-    hash_md5 = hashlib.md5()
 
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+def guess_content_type(data):
+    """Content type of a file from its path or header bytes."""
+    file_type = filetype.guess(data)
+    # default contentType
+    content_type = 'application/octet-stream'
+    if file_type is not None:
+        content_type = file_type.mime
+    return content_type + '; dcp-type=data'
+
+
+def walk_files(paths, max_depth=1):
+    """
+    Files to upload under paths, generated as they are found so that the upload starts with the
+    first one. Directories are read with os.scandir, whose entries know their type without a stat.
+    Hidden files and dirs (starting with '.' or '__') are skipped, unless explicitly specified.
+    """
+    seen = set()
+    for p in paths:
+        # Normalize a pathname by collapsing redundant separators and up-level references so that A//B, A/B/, A/./B and A/foo/../B all become A/B.
+        p = os.path.abspath(p)
+        if p in seen:
+            continue
+        seen.add(p)
+
+        if os.path.isfile(p):
+            yield p
+
+        elif os.path.isdir(p):  # recursively handle dir upload
+            yield from scan_dir(p, max_depth)
+
+
+def scan_dir(path, depth):
+    if depth <= 0:  # skip files deeper than max depth
+        return
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.name.startswith('.') or entry.name.startswith('__'):
+                continue
+            if entry.is_file():
+                yield entry.path
+            elif entry.is_dir():
+                yield from scan_dir(entry.path, depth - 1)
 
 
 class CmdUpload:
@@ -30,59 +109,321 @@ class CmdUpload:
         self.aws = aws
         self.args = args
         self.files = []
+        self.remote_index = None  # key -> RemoteObject of the selected area, listed once per run
+        self.manifest = None  # checksum manifest of the selected area, the uploaded files are recorded in
+        self.md5_copy_denied = False  # single-pass md5 metadata can't be attached without download permission
+        self.file_count = TRANSFER_MAX_WORKERS  # files being uploaded, sharing the transfer resources
+        self.file_count_cond = threading.Condition()
+        self.scheduler = get_transfer_scheduler()
+        self.progress = Progress('Uploading', enabled=not args.no_progress)
+
+    def exists(self, key):
+        if self.remote_index is None:
+            return self.aws.obj_exists(key)
+        return key in self.remote_index
+
+    def is_unchanged(self, data_file, key, file_size, hash_md5=None):
+        """
+        True if the object at key has the size and md5 of data_file.
+        The local md5 is only computed (if not given) when the sizes match, and the remote md5 is
+        taken from the listing ETag when it is one, otherwise from the area manifest or, failing that,
+        the md5 metadata written on upload.
+        """
+        remote = (self.remote_index or {}).get(key)
+        if remote is None or remote.size != file_size:
+            return False
+
+        remote_md5 = remote.md5 or (self.manifest and self.manifest.md5(key, remote.size, remote.last_modified)) \
+            or self.aws.get_md5_metadata(key)
+        if remote_md5 is None:
+            return False
+
+        return remote_md5 == (hash_md5 or cached_md5(data_file))
+
+    def hash_file(self, data_file, key):
+        """
+        md5 of data_file for the transfer stage, None if it won't be needed because the
+        file is streamed (single pass), empty or will be skipped as already uploaded.
+        """
+        if self.args.single_pass or os.path.getsize(data_file) == 0:
+            return None
+
+        if not self.args.o and not self.args.changed_only and self.exists(key):
+            return None
+
+        return cached_md5(data_file)
+
+    def upload_file(self, data_file, key, hash_md5=None):
+        if self.args.single_pass:
+            return self.upload_file_single_pass(data_file, key)
 
-    def upload_file(self, data_file, key):
-        hash_md5 = compute_md5(data_file)
+        file_size = os.path.getsize(data_file)
+
+        if self.args.changed_only and self.is_unchanged(data_file, key, file_size, hash_md5):
+            self.progress.write(f"{data_file} is unchanged.")
 
-        print(f"MD5 hash of {data_file} is {hash_md5}")
+        elif not self.args.o and not self.args.changed_only and self.exists(key):
+            self.progress.write(f"{data_file} already exists. Use -o to overwrite.")
+
+        elif file_size == 0:
+            self.progress.write(f"{data_file} is an empty file")
 
+        else:
+            hash_md5 = hash_md5 or cached_md5(data_file)
+            self.progress.write(f"MD5 hash of {data_file} is {hash_md5}")
+
+            content_type = guess_content_type(data_file)
+
+            with self.progress.file(data_file, file_size) as file_progress:
+                if file_size >= MULTIPART_THRESHOLD:
+                    self.upload_file_multipart(data_file, key, hash_md5, content_type, file_size, file_progress)
+                else:
+                    config = self.scheduler.transfer_config(file_size, self.file_count)
+                    with self.scheduler.connections_for(config):
+                        self.aws.s3_client().upload_file(Filename=data_file,
+                                                         Bucket=self.aws.bucket_name,
+                                                         Key=key,
+                                                         Callback=file_progress,
+                                                         Config=config,
+                                                         ExtraArgs={'ContentType': content_type,
+                                                                    'Metadata': {'md5': hash_md5}
+                                                                    }
+                                                         )
+
+            self.record(key, file_size, hash_md5, content_type)
+
+    def record(self, key, file_size, hash_md5, content_type):
+        if self.manifest is not None:
+            self.manifest.record(key, file_size, hash_md5, content_type)
+
+    def upload_file_multipart(self, data_file, key, hash_md5, content_type, file_size, file_progress):
+        """
+        Multipart upload recorded part by part in the transfer journal. If an earlier upload of
+        the same unmodified file to key was interrupted and --resume is set, only the parts missing
+        from ListParts are uploaded. Otherwise the interrupted upload, superseded by this one, is aborted.
+        An upload to key by another running process is left alone.
+        """
+        s3_client = self.aws.s3_client()
+        bucket = self.aws.bucket_name
+        journal = get_transfer_journal()
+        path = os.path.abspath(data_file)
+        st = os.stat(path)
+
+        entry = journal.get(bucket, key)
+        completed_parts = {}
+
+        if entry and not entry.is_interrupted():
+            entry = None
+        elif entry and self.args.resume and entry.matches(path, st, hash_md5):
+            completed_parts = self.list_parts(entry)
+            if completed_parts is None:  # upload no longer exists (completed, aborted or expired)
+                journal.remove(entry)
+                entry = None
+            else:
+                self.progress.write(f"Resuming upload of {data_file}, "
+                                    f"{len(completed_parts)} parts already uploaded")
+        elif entry:
+            self.abort_upload(entry)
+            entry = None
+
+        if entry is None:
+            completed_parts = {}
+            resp = s3_client.create_multipart_upload(Bucket=bucket, Key=key, ContentType=content_type,
+                                                     Metadata={'md5': hash_md5})
+            entry = JournalEntry(bucket, key, path, st.st_size, st.st_mtime_ns, hash_md5, resp['UploadId'],
+                                 get_chunk_size(file_size))
+            journal.start(entry)
+
+        part_size = entry.part_size
+        part_count = (file_size + part_size - 1) // part_size
+
+        def upload_part(part_number):
+            with self.scheduler.buffer(part_size):
+                with open(path, 'rb') as f:
+                    f.seek((part_number - 1) * part_size)
+                    data = f.read(part_size)
+                resp = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=entry.upload_id,
+                                             PartNumber=part_number, Body=data)
+            journal.add_part(entry.upload_id, part_number, resp['ETag'])
+            file_progress(len(data))
+            return part_number, resp['ETag']
+
+        for part_number in completed_parts:
+            file_progress(min(part_size, file_size - (part_number - 1) * part_size))
+
+        missing_parts = [n for n in range(1, part_count + 1) if n not in completed_parts]
+        part_futures = [self.scheduler.submit_part(upload_part, n) for n in missing_parts]
+        try:
+            for part_future in part_futures:
+                part_number, etag = part_future.result()
+                completed_parts[part_number] = etag
+        finally:
+            for part_future in part_futures:
+                part_future.cancel()
+
+        s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=entry.upload_id,
+                                            MultipartUpload={'Parts': [
+                                                {'PartNumber': n, 'ETag': completed_parts[n]}
+                                                for n in sorted(completed_parts)]})
+        journal.remove(entry)
+
+    def list_parts(self, entry):
+        """part number -> ETag of the parts S3 holds for the upload, None if the upload doesn't exist."""
+        paginator = self.aws.s3_client().get_paginator('list_parts')
+        parts = {}
+        try:
+            for page in paginator.paginate(Bucket=entry.bucket, Key=entry.key, UploadId=entry.upload_id):
+                for part in page.get('Parts', []):
+                    parts[part['PartNumber']] = part['ETag']
+        except ClientError as e:
+            if e.response['Error']['Code'] == 'NoSuchUpload':
+                return None
+            raise
+        return parts
+
+    def abort_upload(self, entry):
+        try:
+            self.aws.s3_client().abort_multipart_upload(Bucket=entry.bucket, Key=entry.key,
+                                                        UploadId=entry.upload_id)
+        except ClientError:
+            pass  # already completed, aborted or expired
+        get_transfer_journal().remove(entry)
+
+    def check_interrupted_uploads(self, selected_area):
+        """
+        Report the interrupted uploads to the area, of processes no longer running, and abort them
+        if --abort-interrupted is set. The ones of files in this upload are resumed if --resume is set.
+        """
+        pending = [entry for entry in get_transfer_journal().pending(self.aws.bucket_name, selected_area)
+                   if entry.is_interrupted()]
+        if not pending:
+            return
+
+        print(f'Interrupted uploads to {selected_area}:')
+        for entry in pending:
+            print(f'{entry.path} -> {entry.key}')
+
+        if self.args.abort_interrupted:
+            print(f'Aborting {len(pending)} interrupted upload(s)')
+            for entry in pending:
+                self.abort_upload(entry)
+        elif self.args.resume:
+            print('Uploads of the files in this upload will be resumed')
+        else:
+            print('Use --resume to resume the uploads of the files in this upload, '
+                  'or --abort-interrupted to abort them')
+
+    def upload_file_single_pass(self, data_file, key):
+        """
+        Upload the file while computing its MD5 over the streamed bytes, then attach
+        the md5 metadata with a server-side copy of the object onto itself. The copy reads the object,
+        so without download (d) permission, e.g. for ux areas, the md5 is only recorded in the manifest
+        and the copy isn't attempted again once denied.
+        """
         file_size = os.path.getsize(data_file)
 
-        if not self.args.o and self.aws.obj_exists(key):
-            print(f"{data_file} already exists. Use -o to overwrite.")
+        if self.args.changed_only and self.is_unchanged(data_file, key, file_size):
+            self.progress.write(f"{data_file} is unchanged.")
+
+        elif not self.args.o and not self.args.changed_only and self.exists(key):
+            self.progress.write(f"{data_file} already exists. Use -o to overwrite.")
 
         elif file_size == 0:
-            print(f"{data_file} is an empty file")
+            self.progress.write(f"{data_file} is an empty file")
 
         else:
-            session = self.aws.new_session()
-            s3 = session.resource('s3')
-
-            file_type = filetype.guess(data_file)
-            # default contentType
-            content_type = 'application/octet-stream'
-            if file_type is not None:
-                content_type = file_type.mime
-            content_type += '; dcp-type=data'
-
-            s3.Bucket(self.aws.bucket_name).upload_file(Filename=data_file,
-                                                        Key=key,
-                                                        Callback=ProgressBar(target=data_file, total=file_size),
-                                                        ExtraArgs={'ContentType': content_type,
-                                                                   'Metadata': {'md5': hash_md5}
-                                                                   }
-                                                        )
+            s3_client = self.aws.s3_client()
+            st = os.stat(data_file)
+            config = self.scheduler.transfer_config(file_size, self.file_count)
+            # boto buffers the parts read from a stream in memory
+            buffered = config.multipart_chunksize * config.max_concurrency if config.use_threads else 0
+
+            # connections reserved before bytes, as by the parts, so the two never wait on each other
+            with open(data_file, 'rb') as f, self.scheduler.connections_for(config), \
+                    self.scheduler.buffer(min(buffered, file_size)), \
+                    self.progress.file(data_file, file_size) as file_progress:
+                head = f.read(FILETYPE_HEADER_SIZE)
+                content_type = guess_content_type(head)
+                reader = HashingReader(f, head)
+
+                s3_client.upload_fileobj(Fileobj=reader,
+                                         Bucket=self.aws.bucket_name,
+                                         Key=key,
+                                         Callback=file_progress,
+                                         Config=config,
+                                         ExtraArgs={'ContentType': content_type})
+
+            hash_md5 = reader.hexdigest()
+            self.progress.write(f"MD5 hash of {data_file} is {hash_md5}")
+            get_hash_cache().put(os.path.abspath(data_file), st, hash_md5)
+
+            try:
+                # the metadata can't be changed once the upload has started, so replace it with a copy.
+                # the copy needs s3:GetObject on the area (d permission)
+                if not self.md5_copy_denied:
+                    with self.scheduler.connections_for(config):
+                        s3_client.copy(CopySource={'Bucket': self.aws.bucket_name, 'Key': key},
+                                       Bucket=self.aws.bucket_name,
+                                       Key=key,
+                                       Config=config,
+                                       ExtraArgs={'ContentType': content_type,
+                                                  'Metadata': {'md5': hash_md5},
+                                                  'MetadataDirective': 'REPLACE'})
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code not in DENIED_CODES:
+                    self.progress.write(f"{data_file} uploaded but md5 metadata could not be attached: {code}")
+                elif not self.md5_copy_denied:
+                    self.md5_copy_denied = True
+                    self.progress.write("md5 metadata not attached, download (d) permission on the area needed - "
+                                        "md5s recorded in the area manifest only")
+
+            self.record(key, file_size, hash_md5, content_type)
 
     def upload_files(self, data_files, prefix):
+        """
+        Upload files in two stages with their own pools. Files are hashed by the hashing pool and
+        handed to the transfer scheduler as soon as their md5 is known, so hashing of the next files
+        overlaps the upload of the previous ones. hashlib releases the GIL while hashing large
+        buffers, so hashing threads run in parallel on all cores.
+        data_files may be a generator - it is consumed as files complete, with at most
+        UPLOAD_QUEUE_SIZE files hashing or uploading, so memory doesn't grow with the number of files.
+        """
+        failed = []
+        self.file_count = 0
+
+        def file_done(data_file, future):
+            try:
+                future.result()
+            except Exception as ex:
+                self.progress.write(f"Exception raised for {data_file}: {ex}")
+                failed.append(data_file)
+            with self.file_count_cond:
+                self.file_count -= 1
+                self.file_count_cond.notify_all()
+
+        def file_hashed(data_file, key, hash_future):
+            if hash_future.exception() is not None:
+                return file_done(data_file, hash_future)
+            future = self.scheduler.submit(self.upload_file, data_file, key, hash_future.result())
+            future.add_done_callback(partial(file_done, data_file))
 
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                executor.submit(self.upload_file, data_file,
-                                f"{prefix}{os.path.basename(data_file)}"): data_file
-                for data_file in data_files
-            }
-
-            # collect each finished job
-            success = True
-            for future in concurrent.futures.as_completed(futures):
-                try:
-                    data_file = futures[future]
-                    future.result()  # read the result of the future object
-                except Exception as ex:
-                    print(f"Exception raised for {data_file}: ", ex)
-                    success = False
-
-            return success
+        try:
+            with ThreadPoolExecutor(max_workers=HASH_MAX_WORKERS) as hash_executor:
+                for data_file in data_files:
+                    with self.file_count_cond:
+                        self.file_count_cond.wait_for(lambda: self.file_count < UPLOAD_QUEUE_SIZE)
+                        self.file_count += 1
+                    key = f"{prefix}{os.path.basename(data_file)}"
+                    hash_future = hash_executor.submit(self.hash_file, data_file, key)
+                    hash_future.add_done_callback(partial(file_hashed, data_file, key))
+        finally:
+            # also if data_files raised - the files handed over are still uploading and recording into
+            # the manifest and progress, which the caller flushes and stops once this returns
+            with self.file_count_cond:
+                self.file_count_cond.wait_for(lambda: self.file_count == 0)
+
+        return not failed
 
     def run(self):
 
@@ -102,45 +443,28 @@ class CmdUpload:
 
         try:
 
-            ps = []
-            for p in self.args.PATH:
-                p = os.path.abspath(
-                    p)  # Normalize a pathname by collapsing redundant separators and up-level references so that A//B, A/B/, A/./B and A/foo/../B all become A/B.
-                if not p in ps:
-                    ps.append(p)
-
-            # create list of files to upload
-            files = []
-
             max_depth = 1  # default
             if DIR_SUPPORT and self.args.r:
                 max_depth = MAX_DIR_DEPTH
 
-            exclude = lambda f: f.startswith('.') or f.startswith('__')
+            if not self.args.o or self.args.changed_only:
+                # one paginated listing of the area instead of a list request per file
+                self.remote_index = self.aws.remote_index(selected_area)
 
-            def get_files(upload_path, curr_path, level):
-                if level < max_depth:  # skip files deeper than max depth
-                    level += 1
-                    for f in os.listdir(curr_path):
-                        full_path = os.path.join(curr_path, f)
-                        # skip hidden files and dirs
-                        if not exclude(f):
-                            if os.path.isfile(full_path):
-                                files.append(full_path)
-
-                            elif os.path.isdir(full_path):
-                                get_files(upload_path, full_path, level)
-
-            for p in ps:
-                if os.path.isfile(p):  # explicitly specified files, whether hidden or starts with '__' not skipped
-                    files.append(p)
-
-                elif os.path.isdir(p):  # recursively handle dir upload
-                    get_files(p, p, 0)
+            self.check_interrupted_uploads(selected_area)
+            self.manifest = Manifest(self.aws, selected_area)
 
             print('Uploading...')
 
-            success = self.upload_files(files, selected_area)
+            with self.progress:
+                try:
+                    success = self.upload_files(walk_files(self.args.PATH, max_depth), selected_area)
+                finally:
+                    if self.manifest.denied:
+                        print(f'The checksum manifest of {selected_area} was not updated, access denied')
+                    elif not self.manifest.flush():
+                        print(f'The checksum manifest of {selected_area} could not be updated')
+            get_hash_cache().evict()
             return (success, "Successful upload") if success else (success, "Failed upload")
 
         except Exception as e:
@@ -1,13 +1,19 @@
 # common functions
 
+import hashlib
 import os
 import pickle
+import sqlite3
 import uuid
 
 from ait.commons.util.settings import DEBUG_MODE, MAX_LEN_PROJECT_NAME
 
 INGEST_UPLOAD_AREA_PREFIX = 's3://org-hca-data-archive-upload-'
 
+# large reads to keep the disk streaming and let hashlib hash outside the GIL
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
 def gen_uuid():
     return str(uuid.uuid4())
 
@@ -24,6 +30,29 @@ def is_valid_project_name(name):
     return 0 < len(name) <= MAX_LEN_PROJECT_NAME
 
 
+def compute_md5(file_path):
+    """Compute the MD5 hash of the file."""
+    hash_md5 = hashlib.md5()
+
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hash_md5.update(chunk)
+    return hash_md5.hexdigest()
+
+
+def sqlite_connect(db_file, *schema):
+    """
+    Open a sqlite database shared by parallel CLI processes - WAL mode and a busy timeout
+    instead of failing on concurrent writers. schema statements are run on connect.
+    """
+    conn = sqlite3.connect(db_file, timeout=30)
+    conn.execute('PRAGMA journal_mode=WAL')
+    for statement in schema:
+        conn.execute(statement)
+    conn.commit()
+    return conn
+
+
 def serialize(name, obj):
     """Returns True if serialized."""
     try:
@@ -0,0 +1,100 @@
+import json
+import os
+import stat
+import time
+
+from ait.commons.util.settings import CREDENTIAL_CACHE_FILE, CREDENTIAL_CACHE_EXPIRY_MARGIN
+
+
+class CachedCredentials:
+    """
+    Result of the cognito/secrets manager handshake for a profile.
+    bucket access/secret keys and the user attributes needed by the commands, valid until the temporary
+    cognito identity credentials expire (expiry, epoch seconds). The temporary credentials themselves
+    are never reused, so they are not kept.
+    """
+
+    def __init__(self, username=None, bucket_access_key=None, bucket_secret_key=None, center_name=None,
+                 user_dir_list=None, is_user=False, expiry=0):
+        self.username = username
+        self.bucket_access_key = bucket_access_key
+        self.bucket_secret_key = bucket_secret_key
+        self.center_name = center_name
+        self.user_dir_list = user_dir_list
+        self.is_user = is_user
+        self.expiry = expiry
+
+    def is_expired(self):
+        return time.time() + CREDENTIAL_CACHE_EXPIRY_MARGIN >= self.expiry
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+    @staticmethod
+    def from_dict(d):
+        creds = CachedCredentials()
+        for k, v in d.items():
+            if hasattr(creds, k):
+                setattr(creds, k, v)
+        return creds
+
+    def __str__(self):
+        return f'CachedCredentials (username={self.username}, center_name={self.center_name}, ' \
+               f'is_user={self.is_user}, expiry={self.expiry})'
+
+
+def _read_cache():
+    """Returns {} if cache not found, unreadable or readable by group/others."""
+    try:
+        if os.stat(CREDENTIAL_CACHE_FILE).st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+            # don't trust credentials that other users could have read or written
+            return {}
+        with open(CREDENTIAL_CACHE_FILE, 'r') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, IOError, ValueError):
+        return {}
+
+
+def _write_cache(cache):
+    """Atomically replace the cache file, readable and writable by owner only."""
+    tmp_file = f'{CREDENTIAL_CACHE_FILE}.{os.getpid()}.tmp'
+    try:
+        fd = os.open(tmp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, stat.S_IRUSR | stat.S_IWUSR)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(cache, f)
+        os.chmod(tmp_file, stat.S_IRUSR | stat.S_IWUSR)
+        os.replace(tmp_file, CREDENTIAL_CACHE_FILE)
+        return True
+    except (OSError, IOError):
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        return False
+
+
+def get_cached_credentials(profile, username):
+    """Returns None if no unexpired credentials are cached for profile and username."""
+    d = _read_cache().get(profile)
+    if not d:
+        return None
+    creds = CachedCredentials.from_dict(d)
+    if creds.username != username or creds.is_expired():
+        return None
+    return creds
+
+
+def set_cached_credentials(profile, creds):
+    cache = _read_cache()
+    # drop expired entries of other profiles while rewriting the file, and fields no longer cached
+    cache = {p: CachedCredentials.from_dict(d) for p, d in cache.items()}
+    cache = {p: creds.to_dict() for p, creds in cache.items() if not creds.is_expired()}
+    cache[profile] = creds.to_dict()
+    return _write_cache(cache)
+
+
+def clear_cached_credentials(profile):
+    cache = _read_cache()
+    if profile in cache:
+        del cache[profile]
+        return _write_cache(cache)
+    return True
@@ -1,6 +1,8 @@
 # from multiprocessing.dummy import Pool
+import concurrent.futures
 import threading
-from time import sleep
+
+from ait.commons.util.transfer_scheduler import get_transfer_scheduler
 
 
 class TransferProgress(object):
@@ -13,6 +15,8 @@ class TransferProgress(object):
 
         with self._lock:
             self._file_transfer.seen_so_far += bytes_amount
+            if self._file_transfer.progress is not None:
+                self._file_transfer.progress(bytes_amount)
             percentage = (self._file_transfer.seen_so_far / self._file_transfer.size) * 100
 
             if percentage == 100.0:
@@ -23,14 +27,17 @@ class TransferProgress(object):
 
 
 class FileTransfer:
-    def __init__(self, path, key, size=0, seen_so_far=0, status='', complete=False):
+    def __init__(self, path, key, size=0, seen_so_far=0, status='', complete=False, etag=None, last_modified=None):
         self.path = path
         self.key = key
         self.size = size
+        self.etag = etag
+        self.last_modified = last_modified  # epoch seconds
         self.seen_so_far = seen_so_far
         self.status = status
         self.complete = complete
         self.successful = False
+        self.progress = None  # FileProgress of the aggregated progress
 
     def __str__(self):
         return f'FileTransfer (path={self.path}, key={self.key}, size={self.size}, seen_so_far={self.seen_so_far}, status={self.status}, complete={self.complete}) '
@@ -40,22 +47,34 @@ class FileTransfer:
 #    p.map(lambda f: self.upload(f), fs)
 #    print('Done.')
 
-# using a thread per file upload instead of threadpool as they are cheap
-
-def transfer(t, fs):
+# file transfers are run by a transfer scheduler, whose pool of workers bounds the threads in flight,
+# and their progress is rendered as a single aggregated bar
+
+def transfer(t, fs, progress, scheduler=None):
+    """
+    Run t(i) for the incomplete files of fs, queued to the workers of scheduler (the shared one by default).
+    t records the result of a file in its FileTransfer. Returns the files not transferred.
+    """
+    def run(i):
+        # registered with the progress once started, queued files are only counted in its totals
+        fs[i].progress = progress.add(fs[i].key, fs[i].size, expected=True)
+        try:
+            t(i)
+        except Exception as ex:
+            fs[i].status = f'Transfer failed. {ex}'
+            fs[i].complete = True
+            fs[i].successful = False
+        finally:
+            fs[i].progress.done()
+
+    scheduler = scheduler or get_transfer_scheduler()
+    futures = []
     for i in range(len(fs)):
         if not fs[i].complete:
-            threading.Thread(target=t, args=(i,)).start()
-
-    # print initial transfer progress
-    for f in fs:
-        print(f'{f.key}  {f.seen_so_far} / {f.size}  {f.status}')
-
-    while True:
-        if [t for t in fs if not t.complete]:
-            sleep(1)  # 1 sec
-            print(f'\033[{len(fs) + 1}A\r')  # go back to start of first progress_list item
-            for f in fs:
-                print(f'{f.key}  {f.seen_so_far} / {f.size}  {f.status}')
-        else:
-            break
+            progress.expect(fs[i].size)
+            futures.append(scheduler.submit(run, i))
+
+    with progress:
+        concurrent.futures.wait(futures)
+
+    return [f for f in fs if not f.successful]
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import threading
+import time
+
+from ait.commons.util.common import compute_md5, sqlite_connect
+from ait.commons.util.settings import HASH_CACHE_FILE, HASH_CACHE_MAX_ENTRIES, HASH_CACHE_MAX_AGE
+
+
+class HashCache:
+    """
+    On-disk cache of file md5s, keyed by absolute path and valid while the file's
+    (size, mtime_ns, inode) stat signature is unchanged.
+    sqlite in WAL mode with a busy timeout so that parallel CLI processes can share it,
+    and a connection per thread as sqlite connections can't be shared between threads.
+    The cache is best effort - any sqlite error is treated as a miss.
+    """
+
+    def __init__(self, db_file=HASH_CACHE_FILE, max_entries=HASH_CACHE_MAX_ENTRIES, max_age=HASH_CACHE_MAX_AGE):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_file,
+                                  'CREATE TABLE IF NOT EXISTS hashes ('
+                                  'path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, inode INTEGER, '
+                                  'md5 TEXT, last_used REAL)',
+                                  'CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes (last_used)')
+            self._local.conn = conn
+        return conn
+
+    def get(self, path, st):
+        """Returns None if path is not cached or its stat signature changed."""
+        try:
+            conn = self._connection()
+            row = conn.execute('SELECT md5 FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?',
+                               (path, st.st_size, st.st_mtime_ns, st.st_ino)).fetchone()
+            if row is None:
+                return None
+            with conn:
+                conn.execute('UPDATE hashes SET last_used = ? WHERE path = ?', (time.time(), path))
+            return row[0]
+        except sqlite3.Error:
+            return None
+
+    def put(self, path, st, md5):
+        try:
+            with self._connection() as conn:
+                conn.execute('INSERT OR REPLACE INTO hashes (path, size, mtime_ns, inode, md5, last_used) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             (path, st.st_size, st.st_mtime_ns, st.st_ino, md5, time.time()))
+            return True
+        except sqlite3.Error:
+            return False
+
+    def evict(self):
+        """Remove entries not used within max_age, then the least recently used beyond max_entries."""
+        try:
+            with self._connection() as conn:
+                conn.execute('DELETE FROM hashes WHERE last_used < ?', (time.time() - self.max_age,))
+                conn.execute('DELETE FROM hashes WHERE path IN ('
+                             'SELECT path FROM hashes ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                             (self.max_entries,))
+            return True
+        except sqlite3.Error:
+            return False
+
+
+_hash_cache = None
+_hash_cache_lock = threading.Lock()
+
+
+def get_hash_cache():
+    global _hash_cache
+    with _hash_cache_lock:
+        if _hash_cache is None:
+            _hash_cache = HashCache()
+        return _hash_cache
+
+
+def cached_md5(file_path):
+    """MD5 of the file from the hash cache, only computed if the file is new or changed since cached."""
+    path = os.path.abspath(file_path)
+    st = os.stat(path)
+    hash_cache = get_hash_cache()
+
+    hash_md5 = hash_cache.get(path, st)
+    if hash_md5 is None:
+        hash_md5 = compute_md5(path)
+        hash_cache.put(path, st, hash_md5)
+    return hash_md5
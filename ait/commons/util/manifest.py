@@ -0,0 +1,144 @@
+import json
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from ait.commons.util.settings import MANIFEST_NAME, MANIFEST_FLUSH_FILES, MANIFEST_MAX_RETRIES
+
+# error codes of a conditional write that lost the race with another writer
+CONFLICT_CODES = ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
+# error codes of a manifest the user can't read or write
+DENIED_CODES = ('AccessDenied', '403')
+
+
+def manifest_key(area):
+    return f'{area}{MANIFEST_NAME}'
+
+
+def is_manifest(key):
+    return key.endswith('/' + MANIFEST_NAME)
+
+
+class Manifest:
+    """
+    Checksum manifest of an area, a single object in the area holding the size, md5, content type and upload
+    time of each file uploaded to it, so that the md5s are read with one GET instead of a HEAD per object.
+    Uploads record their files and merge them into the manifest with conditional writes (If-Match the ETag
+    read, If-None-Match for a new manifest), retried on conflict, so concurrent uploaders keep each other's
+    entries. An entry is only trusted for an object of the same size not modified since it was recorded.
+    Reading is best effort - a manifest that can't be read is treated as empty. Users read it with the
+    ManifestAccess statement of the bucket policy (see bucket_policy.manifestAccessStmt), without download
+    permission on the area; where it is denied, recording stops for the rest of the run.
+    Each flush rewrites the whole manifest, so flushes get less frequent as it grows (every MANIFEST_FLUSH_FILES
+    files, or half its size) to keep the cost of an upload linear in the size of the area.
+    """
+
+    def __init__(self, aws, area):
+        self.aws = aws
+        self.area = area
+        self.key = manifest_key(area)
+        self._entries = None  # name in area -> [size, md5, content type, upload time]
+        self._pending = {}
+        self._flush_at = MANIFEST_FLUSH_FILES  # pending files flushed by record
+        self._denied = False
+        self._lock = threading.Lock()
+
+    @property
+    def denied(self):
+        """True once reading or writing the manifest was denied."""
+        return self._denied
+
+    def _get(self):
+        """(entries, ETag) of the manifest, ({}, None) if the area has none."""
+        try:
+            resp = self.aws.s3_client().get_object(Bucket=self.aws.bucket_name, Key=self.key)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return {}, None
+            raise
+        try:
+            entries = json.loads(resp['Body'].read()).get('files', {})
+        except ValueError:
+            entries = {}  # unreadable, replaced by the next write
+        return entries, resp['ETag']
+
+    def load(self):
+        """Entries of the manifest, read once."""
+        with self._lock:
+            if self._entries is None:
+                try:
+                    self._entries, _ = self._get()
+                except Exception:
+                    self._entries = {}
+            return self._entries
+
+    def md5(self, key, size, last_modified=None):
+        """
+        md5 of the object at key from the manifest, None if it has no entry valid for the object.
+        last_modified (epoch seconds) of the object, if known, is checked against the upload time.
+        """
+        entry = self.load().get(key[len(self.area):])
+        if entry is None or entry[0] != size:
+            return None
+        if last_modified is not None and entry[3] < last_modified:
+            return None  # overwritten since, without the manifest
+        return entry[1]
+
+    def record(self, key, size, md5, content_type):
+        """Record an uploaded file, merged into the manifest by flush."""
+        with self._lock:
+            if self._denied:
+                return
+            self._pending[key[len(self.area):]] = [size, md5, content_type, time.time()]
+            full = len(self._pending) >= self._flush_at
+        if full:
+            self.flush()
+
+    def flush(self):
+        """
+        Merge the recorded files into the manifest. Returns False if it couldn't be written, never raises -
+        it runs in the transfers of files already uploaded.
+        """
+        with self._lock:
+            if self._denied:
+                return False
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return True
+
+        for attempt in range(MANIFEST_MAX_RETRIES):
+            try:
+                s3_client = self.aws.s3_client()
+                entries, etag = self._get()
+                entries.update(pending)
+                body = json.dumps({'version': 1, 'files': entries}, separators=(',', ':'))
+                condition = {'IfMatch': etag} if etag else {'IfNoneMatch': '*'}
+                s3_client.put_object(Bucket=self.aws.bucket_name, Key=self.key, Body=body.encode(),
+                                     ContentType='application/json', **condition)
+            except ClientError as e:
+                code = e.response['Error']['Code']
+                if code in DENIED_CODES:
+                    with self._lock:  # not retried for the rest of the run
+                        self._denied = True
+                        self._pending = {}
+                    return False
+                if code not in CONFLICT_CODES:
+                    break
+                # written by another uploader since it was read, merge again after a random backoff
+                time.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+            except Exception:  # e.g. a connection error
+                break
+            else:
+                with self._lock:
+                    if self._entries is not None:
+                        self._entries.update(pending)
+                    self._flush_at = max(MANIFEST_FLUSH_FILES, len(entries) // 2)
+                return True
+
+        with self._lock:  # kept for the next flush, tried again once as many files are recorded
+            pending.update(self._pending)
+            self._pending = pending
+            self._flush_at = 2 * len(pending)
+        return False
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+
+from ait.commons.util.common import HASH_CHUNK_SIZE
+
+PART_SUFFIX = '.part'
+SIDECAR_SUFFIX = '.part.json'
+
+
+class PartFile:
+    """
+    Download in progress to path + '.part', written part by part with ranged GETs.
+    A sidecar records the object (ETag and size), the part size and the parts written so far,
+    so that an interrupted download of the same object resumes with the missing parts only.
+    The file is renamed to path once complete.
+    """
+
+    def __init__(self, path, etag, size, part_size):
+        self.path = path
+        self.part_path = path + PART_SUFFIX
+        self.sidecar_path = path + SIDECAR_SUFFIX
+        self.etag = etag
+        self.size = size
+        self.part_size = part_size
+        self.parts = set()
+        self._lock = threading.Lock()
+
+    @property
+    def part_count(self):
+        return (self.size + self.part_size - 1) // self.part_size
+
+    def part_range(self, part_number):
+        """(first, last) byte of the part, as in a Range header."""
+        first = (part_number - 1) * self.part_size
+        return first, min(first + self.part_size, self.size) - 1
+
+    def open(self):
+        """
+        Resume the download from the sidecar if it is of the same object, otherwise start afresh.
+        Returns the part numbers already written.
+        """
+        state = self._read_sidecar()
+        if state.get('etag') == self.etag and state.get('size') == self.size and state.get('part_size') \
+                and os.path.isfile(self.part_path) and os.path.getsize(self.part_path) == self.size:
+            self.part_size = state['part_size']
+            self.parts = set(state.get('parts', []))
+        else:
+            with open(self.part_path, 'wb') as f:
+                f.truncate(self.size)
+            self.parts = set()
+            self._write_sidecar()
+        return set(self.parts)
+
+    def write(self, part_number, body, callback=None):
+        """Write the streamed body of the part at its offset, and record the part once on disk."""
+        first, _ = self.part_range(part_number)
+        with open(self.part_path, 'r+b') as f:
+            f.seek(first)
+            for chunk in body.iter_chunks(HASH_CHUNK_SIZE):
+                f.write(chunk)
+                if callback:
+                    callback(len(chunk))
+            f.flush()
+            os.fsync(f.fileno())
+
+        with self._lock:
+            self.parts.add(part_number)
+            self._write_sidecar()
+
+    def commit(self):
+        os.replace(self.part_path, self.path)
+        self._remove(self.sidecar_path)
+
+    def discard(self):
+        self._remove(self.part_path)
+        self._remove(self.sidecar_path)
+
+    def _read_sidecar(self):
+        try:
+            with open(self.sidecar_path, 'r') as f:
+                state = json.load(f)
+            return state if isinstance(state, dict) else {}
+        except (OSError, IOError, ValueError):
+            return {}
+
+    def _write_sidecar(self):
+        tmp_file = f'{self.sidecar_path}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'etag': self.etag, 'size': self.size, 'part_size': self.part_size,
+                       'parts': sorted(self.parts)}, f)
+        os.replace(tmp_file, self.sidecar_path)
+
+    @staticmethod
+    def _remove(path):
+        if os.path.exists(path):
+            os.remove(path)
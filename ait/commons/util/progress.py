@@ -0,0 +1,141 @@
+import heapq
+import os
+import threading
+from contextlib import contextmanager
+
+from tqdm import tqdm
+
+from ait.commons.util.settings import PROGRESS_INTERVAL, PROGRESS_TOP_FILES
+
+
+class FileProgress:
+    """
+    Bytes transferred of one file, passed as the boto callback of its transfer.
+    Only the threads transferring the file update it, so its lock isn't contended by other files.
+    """
+
+    def __init__(self, progress, name, total):
+        self._progress = progress
+        self._lock = threading.Lock()
+        self.name = name
+        self.total = total
+        self.seen = 0
+
+    def __call__(self, bytes_amount):
+        with self._lock:
+            self.seen += bytes_amount
+
+    def done(self):
+        self._progress.file_done(self)
+
+
+class Progress:
+    """
+    Aggregated progress of the file transfers of a command. The transfers only update the counters of
+    their own file; a single thread renders every PROGRESS_INTERVAL seconds one bar of the total bytes,
+    throughput and ETA, with the active files with the most bytes left. Queued files are only counted in
+    the totals (expect) and registered once their transfer starts, so the work per render is in the
+    number of active files, not all files. When disabled (--no-progress), nothing is rendered.
+    """
+
+    def __init__(self, desc, enabled=True, interval=PROGRESS_INTERVAL):
+        self.desc = desc
+        self.enabled = enabled
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = set()
+        self._total = 0
+        self._done_bytes = 0  # bytes of the files done
+        self._file_count = 0
+        self._done_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._bar = None
+
+    def expect(self, total, count=1):
+        """Count files queued for transfer in the totals, registered with expected=True when started."""
+        with self._lock:
+            self._total += total
+            self._file_count += count
+
+    def add(self, name, total, expected=False):
+        """Register a file whose transfer starts, counted in the totals unless expected."""
+        file_progress = FileProgress(self, name, total)
+        with self._lock:
+            self._active.add(file_progress)
+            if not expected:
+                self._total += total
+                self._file_count += 1
+        return file_progress
+
+    def file_done(self, file_progress):
+        with self._lock:
+            if file_progress not in self._active:
+                return
+            self._active.remove(file_progress)
+            # bytes not transferred (skipped or failed file) are no longer expected
+            self._total -= max(0, file_progress.total - file_progress.seen)
+            self._done_bytes += min(file_progress.seen, file_progress.total)
+            self._done_count += 1
+
+    @contextmanager
+    def file(self, name, total, expected=False):
+        file_progress = self.add(name, total, expected)
+        try:
+            yield file_progress
+        finally:
+            file_progress.done()
+
+    def snapshot(self):
+        """(bytes transferred, bytes expected, files done, files, active files with the most bytes left)"""
+        with self._lock:
+            active = list(self._active)
+            seen = self._done_bytes + sum(min(f.seen, f.total) for f in active)
+            total, done_count, file_count = self._total, self._done_count, self._file_count
+        top = heapq.nlargest(PROGRESS_TOP_FILES, active, key=lambda f: f.total - f.seen)
+        return seen, total, done_count, file_count, top
+
+    def render(self):
+        seen, total, done_count, file_count, top = self.snapshot()
+        self._bar.total = total
+        self._bar.set_description(f'{self.desc} {done_count}/{file_count} files', refresh=False)
+        self._bar.set_postfix_str(', '.join(f'{os.path.basename(f.name)} {f.seen * 100 // max(1, f.total)}%'
+                                            for f in top), refresh=False)
+        if seen > self._bar.n:
+            self._bar.update(seen - self._bar.n)
+        else:
+            self._bar.refresh()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.render()
+
+    def write(self, msg):
+        """Print a message without breaking the bar."""
+        if self._bar is not None:
+            tqdm.write(msg)
+        else:
+            print(msg)
+
+    def start(self):
+        if self.enabled and self._thread is None:
+            self._bar = tqdm(total=0, unit='B', unit_scale=True, unit_divisor=1024, mininterval=0)
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.render()
+            self._bar.close()
+            self._bar = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
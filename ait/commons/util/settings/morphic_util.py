@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 
 NAME = 'morphic-util'
@@ -42,3 +43,45 @@ AWS_ACCOUNT = '596988661787'
 AWS_SECRET_NAME_AK_BUCKET = 'AK-bucket'
 AWS_SECRET_NAME_SK_BUCKET = 'SK-bucket'
 AWS_SECRET_NAME_MORPHIC_BUCKET = 's3-bucket'
+
+# cached cognito/bucket credentials per profile, reused until they expire
+CREDENTIAL_CACHE_FILE = USER_HOME + '/.morphic-util-credentials'
+# seconds before the temporary credentials expire at which the cache is treated as stale
+CREDENTIAL_CACHE_EXPIRY_MARGIN = 300
+
+# transfer concurrency - files in flight and boto threads per file
+TRANSFER_MAX_WORKERS = 10
+TRANSFER_MAX_CONCURRENCY = 10
+# threads hashing files ahead of the transfers
+HASH_MAX_WORKERS = os.cpu_count() or 1
+# connections of the shared s3 client and of the transfers in flight at once, sized to the transfer concurrency
+S3_MAX_POOL_CONNECTIONS = TRANSFER_MAX_WORKERS * TRANSFER_MAX_CONCURRENCY
+# bytes of file parts held in memory by all transfers at once
+TRANSFER_MAX_BYTES_IN_FLIGHT = 1024 * 1024 * 1024
+# files found by the directory walk that are waiting to be hashed or uploaded
+UPLOAD_QUEUE_SIZE = 1000
+# threads for the metadata requests (HEAD, tagging) of list, within the s3 client connections
+METADATA_MAX_WORKERS = 32
+# keys per DeleteObjects request (the S3 maximum) and requests in flight at once
+DELETE_BATCH_SIZE = 1000
+DELETE_MAX_BATCHES = 8
+# areas emptied at once by delete-areas, each with its own batches in flight
+AREA_DELETE_MAX_WORKERS = 4
+
+# seconds between renders of the transfer progress, and active files shown
+PROGRESS_INTERVAL = 0.5
+PROGRESS_TOP_FILES = 3
+
+# local cache of file md5s keyed by path and stat signature, entries evicted by age and count
+HASH_CACHE_FILE = USER_HOME + '/.morphic-util-hashes.db'
+HASH_CACHE_MAX_ENTRIES = 100000
+HASH_CACHE_MAX_AGE = 90 * 24 * 60 * 60  # seconds since last used
+
+# journal of multipart uploads in progress, so that interrupted uploads can be resumed
+TRANSFER_JOURNAL_FILE = USER_HOME + '/.morphic-util-transfers.db'
+
+# checksum manifest object of each area, written by upload and merged every MANIFEST_FLUSH_FILES files
+MANIFEST_NAME = '.morphic-util-manifest.json'
+MANIFEST_FLUSH_FILES = 1000
+# conditional writes retried when another uploader updated the manifest concurrently
+MANIFEST_MAX_RETRIES = 10
@@ -25,6 +25,7 @@ class TestCreate(unittest.TestCase):
 
         self.aws_mock.is_user = False
         self.aws_mock.common_session = session
+        self.aws_mock.s3_resource.return_value = resource
         self.aws_mock.bucket_name = 'bucket-name'
 
     def test_create_upload_area_no_config_display_error(self):
@@ -0,0 +1,144 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+from io import StringIO
+
+from ait.commons.util.bucket_policy import manifestAccessStmt
+from ait.commons.util.command.create_areas import CmdCreateAreas
+
+
+class TestCreateAreas(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.mock_aws = MagicMock()
+        self.mock_aws.is_user = False
+        self.mock_aws.bucket_name = 'bucket'
+        self.s3_client = self.mock_aws.s3_client.return_value
+        self.bucket_policy = self.mock_aws.s3_resource.return_value.BucketPolicy.return_value
+        self.bucket_policy.policy = json.dumps({'Version': '2012-10-17', 'Statement': [
+            {'Sid': 'AllowDownload', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::bucket/old/*'},
+            manifestAccessStmt('bucket')]})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        args = Mock()
+        args.FILE = path
+        return args
+
+    def test_areas_from_csv_created_with_one_policy_update(self):
+        args = self.write('areas.csv', 'name,dpc,perms\narea1,DPC1,ud\narea2,dpc1,\narea3,dpc2,udx\narea4,dpc2,ud\n')
+        self.mock_aws.list_prefixes.side_effect = lambda dpc: {
+            'morphic-dpc1/': ['morphic-dpc1/area1/', 'morphic-dpc1/area2/'],
+            'morphic-dpc2/': ['morphic-dpc2/area3/', 'morphic-dpc2/area4/'],
+        }[dpc]
+
+        with patch('sys.stdout', new=StringIO()):
+            success, msg = CmdCreateAreas(self.mock_aws, args).run()
+
+        self.assertTrue(success)
+        self.assertEqual(msg, '4 upload area(s) created')
+        keys = sorted(c.kwargs['Key'] for c in self.s3_client.put_object.call_args_list)
+        self.assertEqual(keys, ['morphic-dpc1/area1/', 'morphic-dpc1/area2/', 'morphic-dpc2/area3/',
+                                'morphic-dpc2/area4/'])
+        self.s3_client.put_object.assert_any_call(Bucket='bucket', Key='morphic-dpc1/area2/',
+                                                  Tagging='name=area2&perms=ux')
+
+        # a single policy update, all the areas of dpc2 allowing download as a DPC wildcard
+        self.bucket_policy.put.assert_called_once()
+        statements = {stmt['Sid']: stmt for stmt in
+                      json.loads(self.bucket_policy.put.call_args.kwargs['Policy'])['Statement']}
+        self.assertEqual(statements['AllowDownload']['Resource'], [
+            'arn:aws:s3:::bucket/old/*', 'arn:aws:s3:::bucket/morphic-dpc1/area1/*',
+            'arn:aws:s3:::bucket/morphic-dpc2/*'])
+        self.assertEqual(statements['DenyDelete']['Resource'], [
+            'arn:aws:s3:::bucket/morphic-dpc1/area1/*', 'arn:aws:s3:::bucket/morphic-dpc2/area4/*'])
+
+    def test_areas_from_json_with_default_perms_leave_policy(self):
+        args = self.write('areas.json', json.dumps([{'name': 'area1', 'dpc': 'dpc1'},
+                                                    {'name': 'area2', 'dpc': 'dpc1', 'perms': 'ux'}]))
+
+        with patch('sys.stdout', new=StringIO()):
+            success, msg = CmdCreateAreas(self.mock_aws, args).run()
+
+        self.assertTrue(success)
+        self.assertEqual(self.s3_client.put_object.call_count, 2)
+        self.bucket_policy.put.assert_not_called()
+
+    def test_default_perms_area_taken_out_of_dpc_wildcard(self):
+        args = self.write('areas.csv', 'name,dpc\nc,dpc1\n')
+        self.bucket_policy.policy = json.dumps({'Version': '2012-10-17', 'Statement': [
+            {'Sid': 'AllowDownload', 'Effect': 'Allow', 'Resource': ['arn:aws:s3:::bucket/morphic-dpc1/*']},
+            {'Sid': 'DenyDelete', 'Effect': 'Deny', 'Resource': ['arn:aws:s3:::bucket/morphic-dpc1/*']},
+            manifestAccessStmt('bucket')]})
+        self.mock_aws.list_prefixes.return_value = ['morphic-dpc1/a/', 'morphic-dpc1/b/', 'morphic-dpc1/c/']
+
+        with patch('sys.stdout', new=StringIO()):
+            success, msg = CmdCreateAreas(self.mock_aws, args).run()
+
+        self.assertTrue(success)
+        statements = json.loads(self.bucket_policy.put.call_args.kwargs['Policy'])['Statement']
+        for stmt in statements[:2]:
+            self.assertEqual(stmt['Resource'], ['arn:aws:s3:::bucket/morphic-dpc1/a/*',
+                                                'arn:aws:s3:::bucket/morphic-dpc1/b/*'])
+
+    def test_manifest_access_added_to_policy(self):
+        args = self.write('areas.csv', 'name,dpc\narea1,dpc1\n')
+        self.bucket_policy.policy = None
+
+        with patch('sys.stdout', new=StringIO()):
+            success, msg = CmdCreateAreas(self.mock_aws, args).run()
+
+        self.assertTrue(success)
+        statements = json.loads(self.bucket_policy.put.call_args.kwargs['Policy'])['Statement']
+        self.assertEqual(statements, [manifestAccessStmt('bucket')])
+        self.assertEqual(statements[0]['Resource'], 'arn:aws:s3:::bucket/*/.morphic-util-manifest.json')
+
+    def test_invalid_file_creates_nothing(self):
+        args = self.write('areas.csv', 'name,dpc,perms\narea1,dpc1,ud\n,dpc1,ux\narea3,dpc1,xd\narea1,dpc1,u\n')
+
+        success, msg = CmdCreateAreas(self.mock_aws, args).run()
+
+        self.assertFalse(success)
+        self.assertEqual(msg.split('\n')[0], 'area 2: invalid name or DPC - needs to be between 1-36 alphanumeric '
+                                             'characters with no space')
+        self.assertIn('area 3: invalid perms xd', msg)
+        self.assertIn('area 4: area1 for dpc1 DPC listed more than once', msg)
+        self.s3_client.put_object.assert_not_called()
+
+    def test_failed_areas_left_out_of_policy(self):
+        args = self.write('areas.csv', 'name,dpc,perms\narea1,dpc1,ud\narea2,dpc1,ud\n')
+
+        def put_object(Bucket, Key, Tagging):
+            if 'area2' in Key:
+                raise Exception('Test')
+
+        self.s3_client.put_object.side_effect = put_object
+        self.mock_aws.list_prefixes.return_value = ['morphic-dpc1/area1/']
+
+        with patch('sys.stdout', new=StringIO()):
+            success, msg = CmdCreateAreas(self.mock_aws, args).run()
+
+        self.assertFalse(success)
+        self.assertEqual(msg, '1 of 2 upload area(s) not created')
+        policy = json.loads(self.bucket_policy.put.call_args.kwargs['Policy'])
+        self.assertIn('arn:aws:s3:::bucket/morphic-dpc1/*', policy['Statement'][0]['Resource'])
+        self.assertNotIn('area2', json.dumps(policy))
+
+    def test_user_cannot_create_areas(self):
+        self.mock_aws.is_user = True
+
+        success, msg = CmdCreateAreas(self.mock_aws, Mock()).run()
+
+        self.assertFalse(success)
+        self.assertEqual(msg, 'You don\'t have permission to use this command')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import MagicMock, Mock, patch
 from io import StringIO
@@ -131,6 +132,76 @@ class MyTestCase(unittest.TestCase):
         res, output = cmd_delete.run()
         self.assertTrue("You don't have permission to use this command" in output)
 
+    @patch("ait.commons.util.command.delete.CmdDelete.all_keys")
+    @patch("ait.commons.util.command.delete.get_selected_area")
+    def test_delete_errors_reported_per_key(self, mock_selected_area, mock_all_keys):
+        mock_args = Mock()
+        mock_args.d = False
+        mock_args.a = False
+        mock_args.PATH = ["mock-dir-1/"]
+        mock_aws = MagicMock()
+        mock_aws.is_user = True
+        mock_aws.s3_client.return_value.delete_objects.return_value = {
+            'Errors': [{'Key': 'mock-area/mock-dir-1/mock-file-2', 'Code': 'AccessDenied'}]}
+
+        mock_selected_area.return_value = "mock-area/"
+        mock_all_keys.return_value = ["mock-area/mock-dir-1/mock-file-1", "mock-area/mock-dir-1/mock-file-2"]
+
+        with patch('sys.stdout', new=StringIO()) as cmd_output:
+            CmdDelete(mock_aws, mock_args).run()
+            cmd_output_lines = cmd_output.getvalue().split("\n")
+            self.assertEqual(cmd_output_lines[1], "mock-area/mock-dir-1/mock-file-1  Done.")
+            self.assertEqual(cmd_output_lines[2], "mock-area/mock-dir-1/mock-file-2  No permission to delete.")
+        mock_aws.s3_client.return_value.delete_objects.assert_called_once()
+
+    @patch("ait.commons.util.command.delete.get_selected_area")
+    def test_delete_path_streams_all_listing_pages(self, mock_selected_area):
+        events = []
+
+        def list_objects(prefix):
+            for i in range(2500):
+                events.append('listed')
+                yield {'Key': f'{prefix}mock-file-{i}'}
+
+        def delete_objects(Bucket, Delete):
+            events.append('deleted')
+            return {}
+
+        mock_args = Mock()
+        mock_args.d = False
+        mock_args.a = False
+        mock_args.PATH = ["mock-dir-1/"]
+        mock_aws = MagicMock()
+        mock_aws.list_objects.side_effect = list_objects
+        mock_aws.s3_client.return_value.delete_objects.side_effect = delete_objects
+        mock_selected_area.return_value = "mock-area/"
+
+        with patch('sys.stdout', new=StringIO()) as cmd_output, \
+                patch('ait.commons.util.batch_delete.DELETE_MAX_BATCHES', 1):
+            CmdDelete(mock_aws, mock_args).run()
+            cmd_output_lines = cmd_output.getvalue().split("\n")
+
+        self.assertEqual(len([line for line in cmd_output_lines if line.endswith('  Done.')]), 2500)
+        self.assertEqual(mock_aws.s3_client.return_value.delete_objects.call_count, 3)
+        self.assertLess(events.index('deleted'), events.index('listed', 2000))
+
+    def test_area_perms_removed_from_adjacent_statements_and_resources(self):
+        policy = {'Version': '2012-10-17', 'Statement': [
+            {'Sid': 'Old1', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::bucket/mock-area/*'},
+            {'Sid': 'Old2', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::bucket/mock-area/*'},
+            {'Sid': 'AllowDownload', 'Effect': 'Allow', 'Resource': [
+                'arn:aws:s3:::bucket/mock-area/*', 'arn:aws:s3:::bucket/mock-area/*', 'arn:aws:s3:::bucket/other/*']},
+        ]}
+        s3_res = MagicMock()
+        bucket_policy = s3_res.BucketPolicy.return_value
+        bucket_policy.policy = json.dumps(policy)
+
+        CmdDelete.delete_dir_perms_from_bucket_policy(s3_res, 'bucket', 'mock-area/')
+
+        statements = json.loads(bucket_policy.put.call_args.kwargs['Policy'])['Statement']
+        self.assertEqual(statements, [
+            {'Sid': 'AllowDownload', 'Effect': 'Allow', 'Resource': ['arn:aws:s3:::bucket/other/*']}])
+
 
 if __name__ == '__main__':
     unittest.main()
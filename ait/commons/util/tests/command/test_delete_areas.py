@@ -0,0 +1,137 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, Mock, patch
+from io import StringIO
+
+from ait.commons.util.command.delete import CmdDelete
+from ait.commons.util.command.delete_areas import CmdDeleteAreas
+
+
+class TestDeleteAreas(unittest.TestCase):
+    def setUp(self):
+        self.objects = {
+            'morphic-dpc/area-1/': [], 'morphic-dpc/area-1/file1': [], 'morphic-dpc/area-1/file2': [],
+            'morphic-dpc/area-2/': [], 'morphic-dpc/area-2/file1': [],
+            'morphic-dpc/area-3/': [], 'morphic-dpc/area-3/locked': [],
+        }
+        self.mock_aws = MagicMock()
+        self.mock_aws.is_user = False
+        self.mock_aws.bucket_name = 'bucket'
+        self.mock_aws.list_objects.side_effect = \
+            lambda prefix: [{'Key': k} for k in list(self.objects) if k.startswith(prefix)]
+        self.s3_client = self.mock_aws.s3_client.return_value
+        self.s3_client.delete_objects.side_effect = self.delete_objects
+
+        self.args = Mock()
+        self.args.AREA = []
+        self.args.f = None
+
+    def delete_objects(self, Bucket, Delete):
+        errors = []
+        for obj in Delete['Objects']:
+            if obj['Key'] == 'morphic-dpc/area-3/locked':
+                errors.append({'Key': obj['Key'], 'Code': 'AccessDenied'})
+            else:
+                self.objects.pop(obj['Key'], None)
+        return {'Errors': errors}
+
+    @patch('ait.commons.util.command.delete_areas.get_selected_area')
+    @patch('ait.commons.util.command.delete.CmdDelete.delete_areas_perms_from_bucket_policy')
+    def test_areas_from_args_and_file_deleted(self, mock_delete_perms, mock_selected_area):
+        mock_selected_area.return_value = None
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            areas_file = os.path.join(tmp_dir, 'areas.txt')
+            with open(areas_file, 'w') as f:
+                f.write('# areas to delete\nmorphic-dpc/area-2\n\nmorphic-dpc/area-3/\nmorphic-dpc/area-1\n')
+            self.args.AREA = ['morphic-dpc/area-1', 'morphic-dpc/area-4']
+            self.args.f = areas_file
+
+            with patch('builtins.input', return_value='y'), patch('sys.stdout', new=StringIO()) as cmd_output:
+                success, msg = CmdDeleteAreas(self.mock_aws, self.args).run()
+                cmd_output_lines = cmd_output.getvalue().split('\n')
+
+        self.assertFalse(success)
+        self.assertEqual(msg, '2 of 4 upload area(s) not deleted')
+        self.assertEqual(list(self.objects), ['morphic-dpc/area-3/locked'])
+        self.assertIn('morphic-dpc/area-1/  Done. 3 file(s) deleted.', cmd_output_lines)
+        self.assertIn('morphic-dpc/area-3/locked  No permission to delete.', cmd_output_lines)
+        self.assertIn('morphic-dpc/area-4/  Upload area does not exist.', cmd_output_lines)
+
+        # a single policy update, for the areas deleted completely
+        mock_delete_perms.assert_called_once()
+        self.assertEqual(sorted(mock_delete_perms.call_args.args[2]),
+                         ['morphic-dpc/area-1/', 'morphic-dpc/area-2/'])
+
+    def test_user_cannot_delete_areas(self):
+        self.mock_aws.is_user = True
+        self.args.AREA = ['morphic-dpc/area-1']
+
+        success, msg = CmdDeleteAreas(self.mock_aws, self.args).run()
+
+        self.assertFalse(success)
+        self.assertEqual(msg, 'You don\'t have permission to use this command')
+        self.s3_client.delete_objects.assert_not_called()
+
+    @patch('ait.commons.util.command.delete_areas.get_selected_area')
+    @patch('ait.commons.util.command.delete.CmdDelete.delete_areas_perms_from_bucket_policy')
+    def test_area_listing_failure_does_not_skip_other_areas(self, mock_delete_perms, mock_selected_area):
+        mock_selected_area.return_value = None
+        list_objects = self.mock_aws.list_objects.side_effect
+
+        def list_objects_failing(prefix):
+            if prefix == 'morphic-dpc/area-2/':
+                raise Exception('listing failed')
+            return list_objects(prefix)
+
+        self.mock_aws.list_objects.side_effect = list_objects_failing
+        self.args.AREA = ['morphic-dpc/area-1', 'morphic-dpc/area-2']
+
+        with patch('builtins.input', return_value='y'), patch('sys.stdout', new=StringIO()) as cmd_output:
+            success, msg = CmdDeleteAreas(self.mock_aws, self.args).run()
+
+        self.assertFalse(success)
+        self.assertEqual(msg, '1 of 2 upload area(s) not deleted')
+        self.assertIn('morphic-dpc/area-2/  Delete failed. 0 file(s) deleted.', cmd_output.getvalue())
+        self.assertIn('morphic-dpc/area-1/  Done. 3 file(s) deleted.', cmd_output.getvalue())
+        # the area deleted still removed from the bucket policy
+        mock_delete_perms.assert_called_once()
+        self.assertEqual(mock_delete_perms.call_args.args[2], ['morphic-dpc/area-1/'])
+
+    def test_keys_other_than_areas_rejected(self):
+        self.args.AREA = ['morphic-dpc', 'morphic-dpc/', 'morphic-dpc/area-1/file1', 'area-1', '/area-1',
+                          'morphic-/area-1', '8dd8f2b6-0b45-4bf0-9e18-2b3b3d5c9a8e', 'morphic-dpc/area-1']
+
+        with patch('builtins.input', return_value='y') as mock_input:
+            success, msg = CmdDeleteAreas(self.mock_aws, self.args).run()
+
+        self.assertFalse(success)
+        self.assertEqual(msg.split('\n'), [f'{area}  Not an upload area - morphic-DPC/name or UUID.' for area in [
+            'morphic-dpc/', 'morphic-dpc/area-1/file1/', 'area-1/', '/area-1/', 'morphic-/area-1/']])
+        mock_input.assert_not_called()
+        self.s3_client.delete_objects.assert_not_called()
+
+    def test_areas_perms_removed_from_bucket_policy_at_once(self):
+        policy = {'Version': '2012-10-17', 'Statement': [
+            {'Sid': 'OldArea1', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::bucket/area-1/*'},
+            {'Sid': 'OldArea2', 'Effect': 'Allow', 'Resource': 'arn:aws:s3:::bucket/area-2/*'},
+            {'Sid': 'AllowDownload', 'Effect': 'Allow', 'Resource': [
+                'arn:aws:s3:::bucket/area-1/*', 'arn:aws:s3:::bucket/area-2/*', 'arn:aws:s3:::bucket/area-5/*']},
+            {'Sid': 'DenyDelete', 'Effect': 'Deny', 'Resource': ['arn:aws:s3:::bucket/area-2/*']},
+        ]}
+        s3_res = MagicMock()
+        bucket_policy = s3_res.BucketPolicy.return_value
+        bucket_policy.policy = json.dumps(policy)
+
+        updated = CmdDelete.delete_areas_perms_from_bucket_policy(s3_res, 'bucket', ['area-1/', 'area-2/'])
+
+        self.assertTrue(updated)
+        bucket_policy.put.assert_called_once()
+        statements = json.loads(bucket_policy.put.call_args.kwargs['Policy'])['Statement']
+        self.assertEqual(statements, [
+            {'Sid': 'AllowDownload', 'Effect': 'Allow', 'Resource': ['arn:aws:s3:::bucket/area-5/*']}])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,16 @@
+import hashlib
+import io
+import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import patch, MagicMock, Mock
 
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
 from ait.commons.util.command.download import CmdDownload
+from ait.commons.util.common import compute_md5
+from ait.commons.util.part_file import PartFile
 
 
 def mock_transfer(_, fs):
@@ -26,7 +35,8 @@ class TestDownload(TestCase):
         self.bucket = bucket
 
         self.upload_file = bucket.upload_file
-        self.download_file = bucket.download_file
+        self.download_file = self.client.download_file
+        self.client.head_object.return_value = {'ContentLength': 2, 'ETag': '"etag"'}
 
         resource = MagicMock()
         resource.BucketPolicy = Mock(return_value=bucket_policy)
@@ -38,8 +48,10 @@ class TestDownload(TestCase):
 
         self.aws_mock.is_user = False
         self.aws_mock.common_session = session
+        self.aws_mock.s3_resource.return_value = resource
         self.aws_mock.bucket_name = 'bucket-name'
         self.aws_mock.new_session.return_value = session
+        self.aws_mock.s3_client.return_value = self.client
 
     @patch('ait.commons.util.command.download.get_selected_area')
     def test_download_no_upload_area_selected(self, get_selected_area):
@@ -84,6 +96,9 @@ class TestDownload(TestCase):
 
         args = MagicMock()
         args.a = True
+        args.workers = None
+        args.skip_existing = False
+        args.verify = False
 
         # when
         cmd = CmdDownload(self.aws_mock, args)
@@ -126,6 +141,9 @@ class TestDownload(TestCase):
         args = MagicMock()
         args.a = False
         args.f = ['filename']
+        args.workers = None
+        args.skip_existing = False
+        args.verify = False
 
         # when
         cmd = CmdDownload(self.aws_mock, args)
@@ -162,6 +180,9 @@ class TestDownload(TestCase):
 
         args = MagicMock()
         args.a = True
+        args.workers = None
+        args.skip_existing = False
+        args.verify = False
 
         # when
         cmd = CmdDownload(self.aws_mock, args)
@@ -174,3 +195,275 @@ class TestDownload(TestCase):
 
         self.download_file.assert_called_once()
 
+    @patch('ait.commons.util.command.download.get_selected_area')
+    @patch('ait.commons.util.command.download.os')
+    def test_download_files_with_bounded_workers(self, os, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        objs = [Mock(key='selected/'), *(Mock(key=f'selected/file{i}', size=2) for i in range(20))]
+        self.bucket.objects.filter.return_value = objs
+
+        os.getcwd.return_value = 'cwd'
+        self.download_file.side_effect = lambda bucket, key, file, Callback, Config: Callback(2)
+
+        args = MagicMock()
+        args.a = True
+        args.workers = 2
+        args.skip_existing = False
+        args.verify = False
+
+        # when
+        cmd = CmdDownload(self.aws_mock, args)
+        success, msg = cmd.run()
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(cmd.scheduler.max_workers, 2)
+        self.assertEqual(self.download_file.call_count, 20)
+        self.assertEqual(len(cmd.files), 20)
+
+    @patch('ait.commons.util.command.download.get_selected_area')
+    @patch('ait.commons.util.command.download.os')
+    def test_requested_files_resolved_and_classified_in_order(self, os, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        os.getcwd.return_value = 'cwd'
+        self.download_file.side_effect = lambda bucket, key, file, Callback, Config: Callback(2)
+
+        def head_object(Bucket, Key):
+            codes = {'selected/missing': '404', 'selected/denied': '403', 'selected/broken': '500'}
+            if Key in codes:
+                raise ClientError({'Error': {'Code': codes[Key]}}, 'HeadObject')
+            return {'ContentLength': 2, 'ETag': '"etag"'}
+
+        self.client.head_object.side_effect = head_object
+
+        args = MagicMock()
+        args.a = False
+        args.f = ['file1', 'missing', 'denied', 'broken', 'file2']
+        args.workers = None
+        args.skip_existing = False
+        args.verify = False
+
+        # when
+        cmd = CmdDownload(self.aws_mock, args)
+        fs = cmd.resolve_files([f'selected/{f}' for f in args.f])
+        success, msg = cmd.run()
+
+        # then
+        self.assertEqual([(f.key, f.status) for f in fs], [
+            ('selected/file1', ''), ('selected/missing', 'File not found.'), ('selected/denied', 'Access denied.'),
+            ('selected/broken', 'Download error.'), ('selected/file2', '')])
+        self.assertFalse(success)
+        self.assertEqual([f.key for f in cmd.files], ['selected/file1', 'selected/file2'])
+        self.assertEqual(self.download_file.call_count, 2)
+
+    @patch('ait.commons.util.command.download.get_selected_area')
+    @patch('ait.commons.util.command.download.os')
+    def test_download_failures_reported_per_file(self, os, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        self.bucket.objects.filter.return_value = [Mock(key='selected/ok', size=2), Mock(key='selected/denied', size=2)]
+
+        os.getcwd.return_value = 'cwd'
+
+        def download_file(bucket, key, file, Callback, Config):
+            if key == 'selected/denied':
+                raise Exception('An error occurred (403) when calling the HeadObject operation: Forbidden')
+            Callback(2)
+
+        self.download_file.side_effect = download_file
+
+        args = MagicMock()
+        args.a = True
+        args.workers = None
+        args.skip_existing = False
+        args.verify = False
+
+        # when
+        cmd = CmdDownload(self.aws_mock, args)
+        success, msg = cmd.run()
+
+        # then
+        self.assertFalse(success)
+        self.assertEqual([f.key for f in cmd.files], ['selected/ok'])
+
+
+@patch('ait.commons.util.command.download.MULTIPART_THRESHOLD', 100)
+@patch('ait.commons.util.command.download.get_chunk_size', return_value=100)
+class TestDownloadLocalFiles(TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir.name)
+        hash_cache_patch = patch('ait.commons.util.command.download.get_hash_cache')
+        self.hash_cache = hash_cache_patch.start()
+        self.addCleanup(hash_cache_patch.stop)
+        cached_md5_patch = patch('ait.commons.util.command.download.cached_md5', side_effect=compute_md5)
+        cached_md5_patch.start()
+        self.addCleanup(cached_md5_patch.stop)
+
+        self.content = bytes(range(250))
+        self.client = MagicMock()
+        self.client.head_object.return_value = {'ETag': '"etag"', 'ContentLength': 250,
+                                                'Metadata': {'md5': hashlib.md5(self.content).hexdigest()}}
+
+        def get_object(Bucket, Key, Range='bytes=0-249', IfMatch=None):
+            first, last = (int(b) for b in Range[len('bytes='):].split('-'))
+            data = self.content[first:last + 1]
+            return {'Body': StreamingBody(io.BytesIO(data), len(data)), 'ETag': '"etag"',
+                    'Metadata': self.client.head_object.return_value['Metadata']}
+
+        self.client.get_object.side_effect = get_object
+
+        self.aws_mock = MagicMock()
+        self.aws_mock.is_user = False
+        self.aws_mock.bucket_name = 'bucket-name'
+        self.aws_mock.s3_client.return_value = self.client
+        bucket = self.aws_mock.s3_resource.return_value.Bucket.return_value
+        bucket.objects.filter.return_value = [Mock(key='selected/file.fastq', size=250)]
+
+        self.args = MagicMock()
+        self.args.a = True
+        self.args.workers = None
+        self.args.skip_existing = False
+        self.args.verify = False
+
+    def tearDown(self) -> None:
+        os.chdir(self.cwd)
+        self.tmp_dir.cleanup()
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_large_file_downloaded_in_ranges(self, get_selected_area, get_chunk_size):
+        # when
+        success, msg = CmdDownload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(self.read('selected/file.fastq'), self.content)
+        ranges = sorted(c[1]['Range'] for c in self.client.get_object.call_args_list)
+        self.assertEqual(ranges, ['bytes=0-99', 'bytes=100-199', 'bytes=200-249'])
+        self.assertFalse(os.path.exists('selected/file.fastq.part'))
+        self.client.download_file.assert_not_called()
+
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_interrupted_download_resumed_with_missing_ranges(self, get_selected_area, get_chunk_size):
+        # given
+        os.makedirs('selected')
+        part_file = PartFile('selected/file.fastq', '"etag"', 250, 100)
+        part_file.open()
+        part_file.write(1, StreamingBody(io.BytesIO(self.content[:100]), 100))
+
+        # when
+        success, msg = CmdDownload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(self.read('selected/file.fastq'), self.content)
+        ranges = sorted(c[1]['Range'] for c in self.client.get_object.call_args_list)
+        self.assertEqual(ranges, ['bytes=100-199', 'bytes=200-249'])
+
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_download_not_matching_md5_discarded(self, get_selected_area, get_chunk_size):
+        # given
+        self.client.head_object.return_value['Metadata']['md5'] = 'other-md5'
+
+        # when
+        success, msg = CmdDownload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertFalse(success)
+        self.assertEqual(os.listdir('selected'), [])
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_skip_existing_only_downloads_missing_and_changed_files(self, get_selected_area, get_chunk_size):
+        # given
+        small = self.content[:50]
+        md5 = hashlib.md5(small).hexdigest()
+        bucket = self.aws_mock.s3_resource.return_value.Bucket.return_value
+        bucket.objects.filter.return_value = [Mock(key=f'selected/{name}', size=50, e_tag=f'"{md5}"')
+                                              for name in ('same', 'modified', 'missing')]
+        self.write('selected/same', small)
+        self.write('selected/modified', small[::-1])
+        self.args.skip_existing = True
+
+        # when
+        cmd = CmdDownload(self.aws_mock, self.args)
+        success, msg = cmd.run()
+
+        # then
+        self.assertTrue(success)
+        downloaded = sorted(c[0][1] for c in self.client.download_file.call_args_list)
+        self.assertEqual(downloaded, ['selected/missing', 'selected/modified'])
+        self.assertEqual(len(cmd.files), 3)
+
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_verified_download_hashed_as_written(self, get_selected_area, get_chunk_size):
+        # given
+        self.content = self.content[:50]
+        self.client.head_object.return_value['Metadata']['md5'] = hashlib.md5(self.content).hexdigest()
+        bucket = self.aws_mock.s3_resource.return_value.Bucket.return_value
+        bucket.objects.filter.return_value = [Mock(key='selected/small', size=50)]
+        self.args.verify = True
+
+        # when
+        success, msg = CmdDownload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(self.read('selected/small'), self.content)
+        self.client.download_file.assert_not_called()
+        self.hash_cache.return_value.put.assert_called_once()
+
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_verified_download_not_matching_md5_discarded(self, get_selected_area, get_chunk_size):
+        # given
+        self.content = self.content[:50]
+        self.client.head_object.return_value['Metadata']['md5'] = 'other-md5'
+        bucket = self.aws_mock.s3_resource.return_value.Bucket.return_value
+        bucket.objects.filter.return_value = [Mock(key='selected/small', size=50)]
+        self.args.verify = True
+
+        # when
+        success, msg = CmdDownload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertFalse(success)
+        self.assertEqual(os.listdir('selected'), [])
+
+    def test_verified_download_part_file_not_opened_raises_its_error(self, get_chunk_size):
+        # given
+        f = Mock(key='selected/small', size=50)
+
+        # when
+        with patch('builtins.open', side_effect=PermissionError('part file not writable')):
+            with self.assertRaises(PermissionError):
+                CmdDownload(self.aws_mock, self.args).download_file_verified(f, Mock())
+
+        # then
+        self.assertFalse(os.path.exists('selected/small.part'))
+
+    @patch('ait.commons.util.command.download.compute_md5')
+    @patch('ait.commons.util.command.download.get_selected_area', return_value='selected/')
+    def test_large_file_without_md5_not_hashed(self, get_selected_area, compute_md5, get_chunk_size):
+        # given
+        del self.client.head_object.return_value['Metadata']['md5']
+
+        # when
+        with patch('ait.commons.util.progress.Progress.write') as progress_write:
+            success, msg = CmdDownload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(self.read('selected/file.fastq'), self.content)
+        compute_md5.assert_not_called()
+        progress_write.assert_any_call('selected/file.fastq has no md5 to be verified against')
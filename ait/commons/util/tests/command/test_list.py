@@ -1,3 +1,4 @@
+import json
 import unittest
 from unittest.mock import MagicMock, Mock, patch
 from io import StringIO
@@ -71,5 +72,97 @@ class TestList(unittest.TestCase):
 
             self.assertTrue("3 items" in cmd_output_lines)
 
+    def list_objects(self, prefix):
+        return [{'Key': prefix, 'Size': 0, 'ETag': '"d41d8cd98f00b204e9800998ecf8427e"'}] + [
+            {'Key': f'{prefix}file{i}', 'Size': i, 'ETag': f'"etag{i}"'} for i in range(50)]
+
+    def test_md5s_looked_up_concurrently_in_listing_order(self):
+        mock_aws = MagicMock()
+        mock_aws.list_objects.side_effect = self.list_objects
+        mock_aws.s3_client.return_value.head_object.side_effect = \
+            lambda Bucket, Key: {'Metadata': {'md5': f'md5-{Key}'}} if not Key.endswith('7') else {'Metadata': {}}
+        test_args = Mock()
+        test_args.fast = False
+
+        contents = list(CmdList(mock_aws, test_args).list_area_contents('area/'))
+
+        self.assertEqual([item['key'] for item in contents], [f'area/file{i}' for i in range(50)])
+        self.assertEqual(contents[1]['md5'], 'md5-area/file1')
+        self.assertEqual(contents[7]['md5'], 'MD5 checksum not found')
+
+    def test_fast_mode_lists_without_lookups(self):
+        mock_aws = MagicMock()
+        mock_aws.list_objects.side_effect = self.list_objects
+        test_args = Mock()
+        test_args.fast = True
+
+        contents = list(CmdList(mock_aws, test_args).list_area_contents('area/'))
+
+        self.assertEqual(contents[3], {'key': 'area/file3', 'size': 3, 'etag': '"etag3"'})
+        mock_aws.s3_client.return_value.head_object.assert_not_called()
+
+
+    def test_contents_streamed_as_listed(self):
+        listed = []
+
+        def list_objects(prefix):
+            for obj in self.list_objects(prefix):
+                listed.append(obj['Key'])
+                yield obj
+
+        mock_aws = MagicMock()
+        mock_aws.list_objects.side_effect = list_objects
+        mock_aws.s3_client.return_value.head_object.return_value = {'Metadata': {'md5': 'md5'}}
+        test_args = Mock()
+        test_args.fast = False
+
+        with patch('ait.commons.util.command.list.LIST_LOOKAHEAD', 10):
+            contents = CmdList(mock_aws, test_args).list_area_contents('area/')
+            first = next(contents)
+
+        self.assertEqual(first, {'key': 'area/file0', 'md5': 'md5'})
+        self.assertLessEqual(len(listed), 12)
+        self.assertEqual(len(list(contents)), 49)
+
+
+    def test_bucket_areas_listed_with_their_tags(self):
+        mock_aws = MagicMock()
+        mock_aws.is_user = False
+        mock_aws.list_prefixes.return_value = (f'area{i}/' for i in range(1001))
+        s3_client = mock_aws.s3_client.return_value
+
+        def get_object_tagging(Bucket, Key):
+            if Key == 'area1000/':
+                return {'TagSet': []}
+            return {'TagSet': [{'Key': 'name', 'Value': Key.strip('/')}, {'Key': 'perms', 'Value': 'ux'}]}
+
+        s3_client.get_object_tagging.side_effect = get_object_tagging
+        s3_client.head_object.return_value = {'Metadata': {'name': 'old-area', 'perms': 'u'}}
+
+        areas = list(CmdList(mock_aws, Mock()).list_bucket_areas())
+
+        mock_aws.list_prefixes.assert_called_once_with('')
+        self.assertEqual(len(areas), 1001)
+        self.assertEqual(areas[5], dict(key='area5/', name='area5', perms='ux'))
+        self.assertEqual(areas[1000], dict(key='area1000/', name='old-area', perms='u'))
+
+
+    def test_md5s_read_from_area_manifest(self):
+        mock_aws = MagicMock()
+        mock_aws.list_objects.side_effect = self.list_objects
+        s3_client = mock_aws.s3_client.return_value
+        manifest = {'files': {f'file{i}': [i, f'manifest-md5-{i}', 'text/plain', 0] for i in range(40)}}
+        s3_client.get_object.return_value = {'Body': StringIO(json.dumps(manifest)), 'ETag': '"etag"'}
+        s3_client.head_object.return_value = {'Metadata': {'md5': 'head-md5'}}
+        test_args = Mock()
+        test_args.fast = False
+
+        contents = list(CmdList(mock_aws, test_args).list_area_contents('area/'))
+
+        self.assertEqual(contents[39], {'key': 'area/file39', 'md5': 'manifest-md5-39'})
+        self.assertEqual(contents[40], {'key': 'area/file40', 'md5': 'head-md5'})
+        self.assertEqual(s3_client.head_object.call_count, 10)
+
+
 if __name__ == '__main__':
     unittest.main()
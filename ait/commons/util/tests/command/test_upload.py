@@ -1,10 +1,23 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from io import StringIO
 from unittest import TestCase
 from unittest.mock import MagicMock, Mock, patch
 
+from botocore.exceptions import ClientError
+
 from ait.commons.util.__main__ import parse_args
-from ait.commons.util.command.upload import CmdUpload
+from ait.commons.util.aws_client import RemoteObject
+from ait.commons.util.command.upload import CmdUpload, walk_files
+from ait.commons.util.common import compute_md5
+from ait.commons.util.transfer_journal import TransferJournal, JournalEntry
 from ait.commons.util.settings import DIR_SUPPORT
 
+DEAD_PID = 2 ** 22 + 1  # pid of an upload process that has exited
+
 
 def mock_transfer(_, fs):
     for f in fs:
@@ -23,7 +36,7 @@ class TestUpload(TestCase):
 
         bucket = Mock()
         bucket.upload_file = Mock()
-        self.upload_file = bucket.upload_file
+        self.upload_file = self.client.upload_file
 
         resource = MagicMock()
         resource.BucketPolicy = Mock(return_value=bucket_policy)
@@ -37,6 +50,7 @@ class TestUpload(TestCase):
         self.aws_mock.common_session = session
         self.aws_mock.bucket_name = 'bucket-name'
         self.aws_mock.new_session.return_value = session
+        self.aws_mock.s3_client.return_value = self.client
 
         self.path_map = {
             'file0': {
@@ -509,3 +523,354 @@ class TestUpload(TestCase):
             uploaded_files_map[f.path] = f
 
         self.assertEqual(list(uploaded_files_map.keys()), [])
+
+
+class TestUploadLocalFiles(TestCase):
+    def setUp(self) -> None:
+        self.aws_mock = MagicMock()
+        self.aws_mock.is_user = False
+        self.client = MagicMock()
+        self.aws_mock.s3_client.return_value = self.client
+        self.aws_mock.bucket_name = 'bucket-name'
+        self.aws_mock.obj_exists.return_value = False
+        self.client.get_object.side_effect = ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        hash_cache_patch = patch('ait.commons.util.command.upload.get_hash_cache')
+        hash_cache_patch.start()
+        self.addCleanup(hash_cache_patch.stop)
+        cached_md5_patch = patch('ait.commons.util.command.upload.cached_md5', side_effect=compute_md5)
+        self.cached_md5 = cached_md5_patch.start()
+        self.addCleanup(cached_md5_patch.stop)
+        self.journal = TransferJournal(db_file=os.path.join(self.tmp_dir.name, 'transfers.db'))
+        journal_patch = patch('ait.commons.util.command.upload.get_transfer_journal', return_value=self.journal)
+        journal_patch.start()
+        self.addCleanup(journal_patch.stop)
+        pid_alive_patch = patch('ait.commons.util.transfer_journal.pid_alive', side_effect=lambda pid: pid != DEAD_PID)
+        pid_alive_patch.start()
+        self.addCleanup(pid_alive_patch.stop)
+        self.data_file = os.path.join(self.tmp_dir.name, 'file.fastq')
+        self.content = b'@read1\nACGT\n+\nIIII\n' * 1000
+        with open(self.data_file, 'wb') as f:
+            f.write(self.content)
+
+        self.streamed = []
+
+        def upload_fileobj(Fileobj, Bucket, Key, **kwargs):
+            # read like boto does for non-seekable streams, part after part
+            for chunk in iter(lambda: Fileobj.read(1000), b''):
+                self.streamed.append(chunk)
+
+        self.client.upload_fileobj.side_effect = upload_fileobj
+
+        self.args = Mock()
+        self.args.o = False
+        self.args.changed_only = False
+        self.args.single_pass = True
+        self.args.resume = False
+        self.args.abort_interrupted = False
+        self.args.PATH = [self.data_file]
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_single_pass_md5_computed_over_streamed_bytes(self):
+        # when
+        with patch('ait.commons.util.hash_cache.compute_md5') as compute_md5:
+            CmdUpload(self.aws_mock, self.args).upload_file(self.data_file, 'selected/file.fastq')
+            compute_md5.assert_not_called()
+
+        # then
+        self.assertEqual(b''.join(self.streamed), self.content)
+        expected_md5 = hashlib.md5(self.content).hexdigest()
+        copy_kwargs = self.client.copy.call_args[1]
+        self.assertEqual(copy_kwargs['Key'], 'selected/file.fastq')
+        self.assertEqual(copy_kwargs['ExtraArgs']['Metadata'], {'md5': expected_md5})
+        self.assertEqual(copy_kwargs['ExtraArgs']['MetadataDirective'], 'REPLACE')
+
+    def test_single_pass_existing_file_not_overwritten(self):
+        # given
+        self.aws_mock.obj_exists.return_value = True
+
+        # when
+        CmdUpload(self.aws_mock, self.args).upload_file(self.data_file, 'selected/file.fastq')
+
+        # then
+        self.client.upload_fileobj.assert_not_called()
+        self.client.copy.assert_not_called()
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    def test_existing_files_checked_against_remote_index(self, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        new_file = os.path.join(self.tmp_dir.name, 'new.fastq')
+        with open(new_file, 'wb') as f:
+            f.write(self.content)
+        self.args.PATH = [self.data_file, new_file]
+        self.args.single_pass = False
+        self.aws_mock.remote_index.return_value = {
+            'selected/file.fastq': RemoteObject('selected/file.fastq', len(self.content), 'etag')
+        }
+
+        # when
+        success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.aws_mock.remote_index.assert_called_once_with('selected/')
+        self.aws_mock.obj_exists.assert_not_called()
+        self.client.upload_file.assert_called_once()
+        self.assertEqual(self.client.upload_file.call_args[1]['Key'], 'selected/new.fastq')
+        # files skipped as already uploaded are not hashed
+        self.cached_md5.assert_called_once_with(new_file)
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    def test_changed_only_uploads_new_and_modified_files(self, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        files = {}
+        for name, content in [('same.fastq', self.content), ('modified.fastq', self.content + b'A'),
+                              ('multipart.fastq', self.content), ('new.fastq', self.content)]:
+            files[name] = os.path.join(self.tmp_dir.name, name)
+            with open(files[name], 'wb') as f:
+                f.write(content)
+        content_md5 = hashlib.md5(self.content).hexdigest()
+
+        self.args.PATH = list(files.values())
+        self.args.single_pass = False
+        self.args.changed_only = True
+        self.aws_mock.remote_index.return_value = {
+            'selected/same.fastq': RemoteObject('selected/same.fastq', len(self.content), content_md5, content_md5),
+            'selected/modified.fastq': RemoteObject('selected/modified.fastq', len(self.content), content_md5,
+                                                    content_md5),
+            'selected/multipart.fastq': RemoteObject('selected/multipart.fastq', len(self.content), 'etag-2'),
+        }
+        self.aws_mock.get_md5_metadata.return_value = content_md5
+
+        # when
+        success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        uploaded_keys = sorted(c[1]['Key'] for c in self.client.upload_file.call_args_list)
+        self.assertEqual(uploaded_keys, ['selected/modified.fastq', 'selected/new.fastq'])
+        self.aws_mock.get_md5_metadata.assert_called_once_with('selected/multipart.fastq')
+
+    def test_hashed_files_are_uploaded_with_their_md5(self):
+        # given
+        files = []
+        for i in range(5):
+            files.append(os.path.join(self.tmp_dir.name, f'file{i}.fastq'))
+            with open(files[-1], 'wb') as f:
+                f.write(self.content + str(i).encode())
+        self.args.o = True
+        self.args.single_pass = False
+
+        # when
+        success = CmdUpload(self.aws_mock, self.args).upload_files(files, 'selected/')
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(self.cached_md5.call_count, 5)
+        uploaded = {c[1]['Key']: c[1]['ExtraArgs']['Metadata']['md5'] for c in self.client.upload_file.call_args_list}
+        self.assertEqual(uploaded, {f'selected/file{i}.fastq': compute_md5(files[i]) for i in range(5)})
+
+    def test_walk_files_skips_hidden_and_deeper_files(self):
+        # given
+        root = os.path.join(self.tmp_dir.name, 'dir1')
+        for path in ['file1', 'dir2/file2', 'dir2/dir3/file3', '.hidden', '__skipped/file4']:
+            os.makedirs(os.path.dirname(os.path.join(root, path)), exist_ok=True)
+            open(os.path.join(root, path), 'w').close()
+        hidden_file = os.path.join(root, '.hidden')
+
+        # when
+        files = list(walk_files([root, root + '/', hidden_file], max_depth=2))
+
+        # then
+        self.assertEqual(sorted(files), sorted([os.path.join(root, 'file1'), os.path.join(root, 'dir2/file2'),
+                                                hidden_file]))
+
+    @patch('ait.commons.util.command.upload.UPLOAD_QUEUE_SIZE', 2)
+    def test_files_generated_while_previous_files_upload(self):
+        # given
+        self.args.o = True
+        self.args.single_pass = False
+        in_flight = []
+
+        def upload_file(Filename, **kwargs):
+            in_flight.remove(Filename)
+
+        self.client.upload_file.side_effect = upload_file
+
+        def generate_files():
+            for i in range(10):
+                self.assertLessEqual(len(in_flight), 2)
+                in_flight.append(self.data_file)
+                yield self.data_file
+
+        # when
+        success = CmdUpload(self.aws_mock, self.args).upload_files(generate_files(), 'selected/')
+
+        # then
+        self.assertTrue(success)
+        self.assertEqual(self.client.upload_file.call_count, 10)
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    def test_uploaded_files_recorded_in_area_manifest(self, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        self.args.o = True
+        self.args.single_pass = False
+
+        # when
+        success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        put_kwargs = self.client.put_object.call_args[1]
+        self.assertEqual(put_kwargs['Key'], 'selected/.morphic-util-manifest.json')
+        self.assertEqual(put_kwargs['IfNoneMatch'], '*')
+        files = json.loads(put_kwargs['Body'])['files']
+        self.assertEqual(files['file.fastq'][:2], [len(self.content), compute_md5(self.data_file)])
+
+    def start_interrupted_upload(self, part_size, key='selected/file.fastq', upload_id='upload-id', pid=DEAD_PID):
+        st = os.stat(self.data_file)
+        entry = JournalEntry('bucket-name', key, os.path.abspath(self.data_file), st.st_size,
+                             st.st_mtime_ns, compute_md5(self.data_file), upload_id, part_size, pid=pid)
+        self.journal.start(entry)
+        self.journal.add_part(upload_id, 1, 'etag-1')
+        self.client.get_paginator.return_value.paginate.return_value = [
+            {'Parts': [{'PartNumber': 1, 'ETag': 'etag-1'}]}
+        ]
+        self.client.upload_part.side_effect = lambda **kwargs: {'ETag': f"etag-{kwargs['PartNumber']}"}
+        self.client.create_multipart_upload.return_value = {'UploadId': 'new-upload-id'}
+        return entry
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    @patch('ait.commons.util.command.upload.MULTIPART_THRESHOLD', 1000)
+    @patch('ait.commons.util.command.upload.get_chunk_size', return_value=8000)
+    def test_interrupted_multipart_upload_resumed(self, get_chunk_size, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        self.start_interrupted_upload(part_size=8000)
+        self.args.o = True
+        self.args.single_pass = False
+        self.args.resume = True
+
+        # when
+        success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.client.create_multipart_upload.assert_not_called()
+        uploaded_parts = sorted(c[1]['PartNumber'] for c in self.client.upload_part.call_args_list)
+        self.assertEqual(uploaded_parts, [2, 3])  # 19000 bytes in 8000 byte parts, part 1 already uploaded
+        last_part = [c[1] for c in self.client.upload_part.call_args_list if c[1]['PartNumber'] == 3][0]
+        self.assertEqual(last_part['Body'], self.content[16000:])
+        self.client.complete_multipart_upload.assert_called_once()
+        parts = self.client.complete_multipart_upload.call_args[1]['MultipartUpload']['Parts']
+        self.assertEqual(parts, [{'PartNumber': n, 'ETag': f'etag-{n}'} for n in [1, 2, 3]])
+        self.assertIsNone(self.journal.get('bucket-name', 'selected/file.fastq'))
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    @patch('ait.commons.util.command.upload.MULTIPART_THRESHOLD', 1000)
+    @patch('ait.commons.util.command.upload.get_chunk_size', return_value=8000)
+    def test_interrupted_multipart_upload_replaced_without_resume(self, get_chunk_size, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        self.start_interrupted_upload(part_size=8000)
+        self.args.o = True
+        self.args.single_pass = False
+
+        # when
+        success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.client.abort_multipart_upload.assert_called_once_with(Bucket='bucket-name', Key='selected/file.fastq',
+                                                                   UploadId='upload-id')
+        self.client.create_multipart_upload.assert_called_once()
+        self.assertEqual(self.client.upload_part.call_count, 3)
+        self.assertIsNone(self.journal.get('bucket-name', 'selected/file.fastq'))
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    def test_interrupted_uploads_left_alone_by_default(self, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        self.start_interrupted_upload(part_size=8000, key='selected/other.fastq')
+        self.args.o = True
+
+        # when
+        with patch('builtins.input') as mock_input, patch('sys.stdout', new=StringIO()) as cmd_output:
+            success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        mock_input.assert_not_called()
+        self.assertIn('--abort-interrupted', cmd_output.getvalue())
+        self.client.abort_multipart_upload.assert_not_called()
+        self.assertIsNotNone(self.journal.get('bucket-name', 'selected/other.fastq'))
+
+    @patch('ait.commons.util.command.upload.get_selected_area')
+    def test_only_uploads_of_exited_processes_aborted(self, get_selected_area):
+        # given
+        get_selected_area.return_value = 'selected/'
+        self.start_interrupted_upload(part_size=8000, key='selected/other.fastq')
+        self.start_interrupted_upload(part_size=8000, key='selected/running.fastq', upload_id='running-id',
+                                      pid=os.getppid())
+        self.args.o = True
+        self.args.abort_interrupted = True
+
+        # when
+        with patch('sys.stdout', new=StringIO()):
+            success, msg = CmdUpload(self.aws_mock, self.args).run()
+
+        # then
+        self.assertTrue(success)
+        self.client.abort_multipart_upload.assert_called_once_with(Bucket='bucket-name', Key='selected/other.fastq',
+                                                                   UploadId='upload-id')
+        self.assertIsNotNone(self.journal.get('bucket-name', 'selected/running.fastq'))
+
+    def test_files_handed_over_uploaded_before_walk_error_raised(self):
+        # given
+        self.args.o = True
+        self.args.single_pass = False
+        uploaded = threading.Event()
+
+        def upload_file(Filename, **kwargs):
+            uploaded.wait(5)
+
+        self.client.upload_file.side_effect = upload_file
+
+        def generate_files():
+            yield self.data_file
+            raise PermissionError('directory not readable')
+
+        # when
+        cmd = CmdUpload(self.aws_mock, self.args)
+        threading.Timer(0.2, uploaded.set).start()
+        with self.assertRaises(PermissionError):
+            cmd.upload_files(generate_files(), 'selected/')
+
+        # then
+        self.assertTrue(uploaded.is_set())
+        self.assertEqual(cmd.file_count, 0)
+        self.client.upload_file.assert_called_once()
+
+    def test_single_pass_md5_copy_not_retried_once_denied(self):
+        # given
+        self.client.copy.side_effect = ClientError({'Error': {'Code': 'AccessDenied'}}, 'CopyObject')
+        cmd = CmdUpload(self.aws_mock, self.args)
+        cmd.manifest = MagicMock()
+
+        # when
+        cmd.upload_file(self.data_file, 'selected/file1.fastq')
+        cmd.upload_file(self.data_file, 'selected/file2.fastq')
+
+        # then
+        self.client.copy.assert_called_once()
+        self.assertEqual(self.client.upload_fileobj.call_count, 2)
+        expected_md5 = hashlib.md5(self.content).hexdigest()
+        recorded = [c.args[:3] for c in cmd.manifest.record.call_args_list]
+        self.assertEqual(recorded, [('selected/file1.fastq', len(self.content), expected_md5),
+                                    ('selected/file2.fastq', len(self.content), expected_md5)])
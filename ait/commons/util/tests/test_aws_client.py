@@ -0,0 +1,68 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+
+from ait.commons.util.aws_client import Aws
+
+
+class TestAws(unittest.TestCase):
+    def setUp(self) -> None:
+        self.session = MagicMock()
+        self.session.client.side_effect = lambda *args, **kwargs: MagicMock()
+        self.session.resource.side_effect = lambda *args, **kwargs: MagicMock()
+
+        with patch.object(Aws, 'new_session', return_value=self.session):
+            self.aws = Aws(MagicMock())
+
+    def test_s3_client_is_shared_across_threads(self):
+        clients = []
+
+        threads = [threading.Thread(target=lambda: clients.append(self.aws.s3_client())) for _ in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(set(map(id, clients))), 1)
+        self.session.client.assert_called_once()
+        self.assertEqual(self.session.client.call_args[0], ('s3',))
+
+    def test_s3_resource_is_per_thread(self):
+        main_resource = self.aws.s3_resource()
+        thread_resources = []
+
+        t = threading.Thread(target=lambda: thread_resources.append(self.aws.s3_resource()))
+        t.start()
+        t.join()
+
+        self.assertIs(self.aws.s3_resource(), main_resource)
+        self.assertIsNot(thread_resources[0], main_resource)
+
+    def test_obj_exists_uses_shared_client(self):
+        self.aws.s3_client().list_objects_v2.return_value = {'Contents': [{'Key': 'area/file'}]}
+
+        self.assertTrue(self.aws.obj_exists('area/file'))
+        self.assertFalse(self.aws.obj_exists('area/fil'))
+        self.session.client.assert_called_once()
+
+    def test_remote_index_follows_pagination(self):
+        paginator = self.aws.s3_client().get_paginator.return_value
+        paginator.paginate.return_value = [
+            {'Contents': [{'Key': 'area/', 'Size': 0, 'ETag': '"d41d8cd98f00b204e9800998ecf8427e"'},
+                          {'Key': 'area/file1', 'Size': 10, 'ETag': '"0cc175b9c0f1b6a831c399e269772661"'}]},
+            {'Contents': [{'Key': 'area/file2', 'Size': 20, 'ETag': '"9b2cf535f27731c974343645a3985328-3"'}]},
+            {}
+        ]
+
+        index = self.aws.remote_index('area/')
+
+        paginator.paginate.assert_called_once_with(Bucket=self.aws.bucket_name, Prefix='area/')
+        self.assertEqual(list(index.keys()), ['area/', 'area/file1', 'area/file2'])
+        self.assertEqual(index['area/file1'].size, 10)
+        self.assertEqual(index['area/file1'].md5, '0cc175b9c0f1b6a831c399e269772661')
+        # multipart ETag is not the md5 of the content
+        self.assertIsNone(index['area/file2'].md5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+from ait.commons.util.batch_delete import delete_keys
+
+
+class TestBatchDelete(unittest.TestCase):
+    def setUp(self):
+        self.aws = MagicMock()
+        self.aws.bucket_name = 'bucket'
+        self.s3_client = self.aws.s3_client.return_value
+        self.s3_client.delete_objects.return_value = {}
+
+    def test_keys_deleted_in_batches_of_1000(self):
+        keys = [f'area/file{i}' for i in range(2500)]
+
+        results = list(delete_keys(self.aws, iter(keys)))
+
+        self.assertEqual(results, [(k, None) for k in keys])
+        batch_sizes = sorted(len(c.kwargs['Delete']['Objects']) for c in self.s3_client.delete_objects.call_args_list)
+        self.assertEqual(batch_sizes, [500, 1000, 1000])
+
+    def test_per_key_errors_reported(self):
+        self.s3_client.delete_objects.return_value = {
+            'Errors': [{'Key': 'area/file1', 'Code': 'AccessDenied', 'Message': 'Access Denied'}]}
+
+        results = list(delete_keys(self.aws, ['area/file0', 'area/file1', 'area/file2']))
+
+        self.assertEqual(results, [('area/file0', None), ('area/file1', 'AccessDenied'), ('area/file2', None)])
+
+    def test_failed_request_reported_for_its_keys(self):
+        def delete_objects(Bucket, Delete):
+            if Delete['Objects'][0]['Key'] == 'area/file0':
+                raise ClientError({'Error': {'Code': 'AccessDenied'}}, 'DeleteObjects')
+            return {}
+
+        self.s3_client.delete_objects.side_effect = delete_objects
+        keys = [f'area/file{i}' for i in range(1500)]
+
+        results = dict(delete_keys(self.aws, keys))
+
+        self.assertEqual(results['area/file999'], 'AccessDenied')
+        self.assertIsNone(results['area/file1000'])
+
+    def test_batches_in_flight_bounded(self):
+        lock = threading.Lock()
+        in_flight = []
+        max_in_flight = []
+
+        def delete_objects(Bucket, Delete):
+            with lock:
+                in_flight.append(1)
+                max_in_flight.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+            return {}
+
+        self.s3_client.delete_objects.side_effect = delete_objects
+        keys = (f'area/file{i}' for i in range(20000))
+
+        results = list(delete_keys(self.aws, keys, max_batches=4))
+
+        self.assertEqual(len(results), 20000)
+        self.assertLessEqual(max(max_in_flight), 4)
+        self.assertGreater(max(max_in_flight), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
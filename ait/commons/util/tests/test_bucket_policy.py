@@ -0,0 +1,102 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+from ait.commons.util.bucket_policy import BUCKET_POLICY_MAX_SIZE, allowDownloadStmt, denyDeleteStmt, \
+    policy_headroom, policy_size, update_area_perms
+
+BUCKET = 'bucket'
+
+
+def res(key):
+    return f'arn:aws:s3:::{BUCKET}/{key}*'
+
+
+def policy_with(allow=None, deny=None):
+    statements = []
+    if allow is not None:
+        statements.append(dict(allowDownloadStmt(), Resource=allow))
+    if deny is not None:
+        statements.append(dict(denyDeleteStmt(), Resource=deny))
+    return {'Version': '2012-10-17', 'Statement': statements}
+
+
+def resources(policy, sid):
+    return next((stmt['Resource'] for stmt in policy['Statement'] if stmt['Sid'] == sid), None)
+
+
+class TestBucketPolicy(unittest.TestCase):
+    def setUp(self):
+        self.areas = {
+            'morphic-dpc1/': ['morphic-dpc1/a/', 'morphic-dpc1/b/', 'morphic-dpc1/c/'],
+            'morphic-dpc2/': ['morphic-dpc2/x/', 'morphic-dpc2/y/'],
+            'morphic-dpc3/': [],
+        }
+        self.list_dpc_areas = Mock(side_effect=lambda dpc: self.areas[dpc])
+
+    def test_areas_of_dpc_sharing_perms_collapsed_into_wildcard(self):
+        policy = policy_with(deny=[res('morphic-dpc1/a/'), res('morphic-dpc1/b/')])
+
+        changed = update_area_perms(policy, BUCKET, self.list_dpc_areas, add=[('morphic-dpc1/c/', 'u')])
+
+        self.assertTrue(changed)
+        self.assertEqual(resources(policy, 'DenyDelete'), [res('morphic-dpc1/')])
+        self.assertIsNone(resources(policy, 'AllowDownload'))
+
+    def test_wildcard_expanded_for_new_area_with_other_perms(self):
+        self.areas['morphic-dpc2/'].append('morphic-dpc2/z/')
+        policy = policy_with(allow=[res('morphic-dpc2/')], deny=[res('morphic-dpc2/')])
+
+        update_area_perms(policy, BUCKET, self.list_dpc_areas, add=[('morphic-dpc2/z/', 'udx')])
+
+        self.assertEqual(resources(policy, 'AllowDownload'), [res('morphic-dpc2/')])
+        self.assertEqual(resources(policy, 'DenyDelete'), [res('morphic-dpc2/x/'), res('morphic-dpc2/y/')])
+
+    def test_existing_area_replaced_with_new_perms(self):
+        policy = policy_with(allow=[res('morphic-dpc1/a/')], deny=[res('morphic-dpc1/a/'), res('morphic-dpc1/b/')])
+
+        update_area_perms(policy, BUCKET, self.list_dpc_areas, add=[('morphic-dpc1/a/', 'udx')])
+
+        self.assertEqual(resources(policy, 'AllowDownload'), [res('morphic-dpc1/a/')])
+        self.assertEqual(resources(policy, 'DenyDelete'), [res('morphic-dpc1/b/')])
+
+    def test_removed_area_statement_left_empty_dropped(self):
+        policy = policy_with(allow=[res('morphic-dpc1/a/')], deny=[res('morphic-dpc1/b/')])
+
+        update_area_perms(policy, BUCKET, self.list_dpc_areas, remove=['morphic-dpc1/a/'])
+
+        self.assertIsNone(resources(policy, 'AllowDownload'))
+        self.assertEqual(resources(policy, 'DenyDelete'), [res('morphic-dpc1/b/')])
+
+    def test_only_dpcs_changed_listed(self):
+        policy = policy_with(allow=[res('morphic-dpc2/'), res('morphic-dpc1/a/')])
+
+        update_area_perms(policy, BUCKET, self.list_dpc_areas, add=[('morphic-dpc1/b/', 'ud')])
+
+        self.list_dpc_areas.assert_called_once_with('morphic-dpc1/')
+        self.assertEqual(resources(policy, 'AllowDownload'),
+                         [res('morphic-dpc2/'), res('morphic-dpc1/a/'), res('morphic-dpc1/b/')])
+
+    def test_compact_all_dedupes_and_drops_wildcards_of_empty_dpcs(self):
+        policy = policy_with(allow=[res('legacy-area/'), res('morphic-dpc2/x/'), res('legacy-area/'),
+                                    res('morphic-dpc3/'), res('morphic-dpc2/y/'), res('morphic-dpc2/x/')])
+
+        changed = update_area_perms(policy, BUCKET, self.list_dpc_areas, compact_all=True)
+
+        self.assertTrue(changed)
+        self.assertEqual(resources(policy, 'AllowDownload'), [res('legacy-area/'), res('morphic-dpc2/')])
+
+    def test_compacted_policy_unchanged(self):
+        policy = policy_with(allow=[res('morphic-dpc2/')], deny=[res('morphic-dpc1/a/')])
+
+        self.assertFalse(update_area_perms(policy, BUCKET, self.list_dpc_areas, compact_all=True))
+
+    def test_policy_headroom(self):
+        policy = policy_with(allow=[res('morphic-dpc1/a/')])
+
+        self.assertEqual(policy_size(policy), len(json.dumps(policy, separators=(',', ':'))))
+        self.assertEqual(policy_headroom(policy), BUCKET_POLICY_MAX_SIZE - policy_size(policy))
+
+
+if __name__ == '__main__':
+    unittest.main()
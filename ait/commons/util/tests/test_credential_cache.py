@@ -0,0 +1,104 @@
+import json
+import os
+import stat
+import tempfile
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from ait.commons.util.aws_client import Aws
+from ait.commons.util.credential_cache import CachedCredentials, get_cached_credentials, set_cached_credentials, \
+    clear_cached_credentials
+
+
+class TestCredentialCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_file = os.path.join(self.tmp_dir.name, 'credentials')
+        self.cache_file_patch = patch('ait.commons.util.credential_cache.CREDENTIAL_CACHE_FILE', self.cache_file)
+        self.cache_file_patch.start()
+
+    def tearDown(self) -> None:
+        self.cache_file_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def credentials(self, username='user', expiry=None):
+        return CachedCredentials(username=username, bucket_access_key='ak', bucket_secret_key='sk',
+                                 center_name='dpc', user_dir_list=['morphic-dpc/area'], is_user=True,
+                                 expiry=expiry if expiry is not None else time.time() + 3600)
+
+    def test_cached_credentials_are_reused(self):
+        set_cached_credentials('profile', self.credentials())
+
+        creds = get_cached_credentials('profile', 'user')
+
+        self.assertEqual(creds.bucket_access_key, 'ak')
+        self.assertEqual(creds.user_dir_list, ['morphic-dpc/area'])
+        self.assertTrue(creds.is_user)
+
+    def test_cache_file_is_owner_only(self):
+        set_cached_credentials('profile', self.credentials())
+
+        mode = stat.S_IMODE(os.stat(self.cache_file).st_mode)
+        self.assertEqual(mode, stat.S_IRUSR | stat.S_IWUSR)
+
+    def test_cache_readable_by_others_is_ignored(self):
+        set_cached_credentials('profile', self.credentials())
+        os.chmod(self.cache_file, 0o644)
+
+        self.assertIsNone(get_cached_credentials('profile', 'user'))
+
+    def test_expired_credentials_are_not_reused(self):
+        set_cached_credentials('profile', self.credentials(expiry=time.time() + 10))
+
+        self.assertIsNone(get_cached_credentials('profile', 'user'))
+
+    def test_credentials_of_other_user_or_profile_are_not_reused(self):
+        set_cached_credentials('profile', self.credentials())
+
+        self.assertIsNone(get_cached_credentials('profile', 'other-user'))
+        self.assertIsNone(get_cached_credentials('other-profile', 'user'))
+
+    def test_clear_cached_credentials(self):
+        set_cached_credentials('profile', self.credentials())
+        set_cached_credentials('other-profile', self.credentials())
+
+        clear_cached_credentials('profile')
+
+        self.assertIsNone(get_cached_credentials('profile', 'user'))
+        self.assertIsNotNone(get_cached_credentials('other-profile', 'user'))
+
+    @patch('ait.commons.util.aws_client.AwsCognitoAuthenticator')
+    def test_warm_session_skips_authentication(self, authenticator):
+        set_cached_credentials('profile', self.credentials())
+        user_profile = MagicMock()
+        user_profile.name = 'profile'
+        user_profile.username = 'user'
+
+        aws = Aws(user_profile)
+
+        authenticator.assert_not_called()
+        self.assertTrue(aws.from_cache)
+        self.assertEqual(aws.center_name, 'dpc')
+        self.assertEqual(aws.access_key, 'ak')
+
+    def test_temporary_credentials_not_kept(self):
+        # an entry cached with the temporary cognito credentials
+        set_cached_credentials('other-profile', self.credentials())
+        with open(self.cache_file, 'r') as f:
+            cache = json.load(f)
+        cache['other-profile'].update(access_key='tmp-ak', secret_key='tmp-sk', session_token='token')
+        with open(self.cache_file, 'w') as f:
+            json.dump(cache, f)
+
+        set_cached_credentials('profile', self.credentials())
+
+        with open(self.cache_file, 'r') as f:
+            content = f.read()
+        for secret in ('tmp-ak', 'tmp-sk', 'token'):
+            self.assertNotIn(secret, content)
+        self.assertIsNotNone(get_cached_credentials('other-profile', 'user'))
+
+
+if __name__ == '__main__':
+    unittest.main()
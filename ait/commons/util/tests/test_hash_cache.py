@@ -0,0 +1,74 @@
+import hashlib
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from ait.commons.util.hash_cache import HashCache, cached_md5
+
+
+class TestHashCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.hash_cache = HashCache(db_file=os.path.join(self.tmp_dir.name, 'hashes.db'), max_entries=2,
+                                    max_age=3600)
+        self.data_file = os.path.join(self.tmp_dir.name, 'file')
+        self.write(self.data_file, b'content')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def write(self, path, content):
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def test_hit_while_stat_signature_unchanged(self):
+        st = os.stat(self.data_file)
+        self.hash_cache.put(self.data_file, st, 'md5')
+
+        self.assertEqual(self.hash_cache.get(self.data_file, os.stat(self.data_file)), 'md5')
+
+    def test_miss_when_file_modified(self):
+        st = os.stat(self.data_file)
+        self.hash_cache.put(self.data_file, st, 'md5')
+        self.write(self.data_file, b'modified content')
+        os.utime(self.data_file, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+
+        self.assertIsNone(self.hash_cache.get(self.data_file, os.stat(self.data_file)))
+
+    def test_evict_least_recently_used_beyond_max_entries(self):
+        st = os.stat(self.data_file)
+        with patch('ait.commons.util.hash_cache.time.time', side_effect=[1000, 1001, 1002, 1003]):
+            self.hash_cache.put('a', st, 'md5-a')
+            self.hash_cache.put('b', st, 'md5-b')
+            self.hash_cache.put('c', st, 'md5-c')
+            self.hash_cache.evict()
+
+        self.assertIsNone(self.hash_cache.get('a', st))
+        self.assertEqual(self.hash_cache.get('c', st), 'md5-c')
+
+    def test_evict_entries_older_than_max_age(self):
+        st = os.stat(self.data_file)
+        with patch('ait.commons.util.hash_cache.time.time', return_value=time.time() - 7200):
+            self.hash_cache.put('old', st, 'md5')
+
+        self.hash_cache.evict()
+
+        self.assertIsNone(self.hash_cache.get('old', st))
+
+    def test_cached_md5_only_hashes_changed_files(self):
+        with patch('ait.commons.util.hash_cache.get_hash_cache', return_value=self.hash_cache), \
+                patch('ait.commons.util.hash_cache.compute_md5', return_value='md5') as compute_md5:
+            self.assertEqual(cached_md5(self.data_file), 'md5')
+            self.assertEqual(cached_md5(self.data_file), 'md5')
+
+        compute_md5.assert_called_once()
+
+    def test_cached_md5_of_real_file(self):
+        with patch('ait.commons.util.hash_cache.get_hash_cache', return_value=self.hash_cache):
+            self.assertEqual(cached_md5(self.data_file), hashlib.md5(b'content').hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import io
+import json
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError, EndpointConnectionError
+
+from ait.commons.util.manifest import Manifest, manifest_key, is_manifest
+
+
+class FakeS3:
+    """In memory objects with the conditional writes of S3."""
+
+    def __init__(self):
+        self.objects = {}  # key -> (body, etag)
+        self.puts = 0
+        self.before_put = None
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key):
+        with self._lock:
+            if Key not in self.objects:
+                raise ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+            body, etag = self.objects[Key]
+        return {'Body': io.BytesIO(body), 'ETag': etag}
+
+    def put_object(self, Bucket, Key, Body, ContentType, IfMatch=None, IfNoneMatch=None):
+        if self.before_put:
+            before_put, self.before_put = self.before_put, None
+            before_put()
+        with self._lock:
+            current = self.objects.get(Key)
+            if (IfNoneMatch == '*' and current) or (IfMatch and (not current or current[1] != IfMatch)):
+                raise ClientError({'Error': {'Code': 'PreconditionFailed'}}, 'PutObject')
+            self.puts += 1
+            self.objects[Key] = (Body, f'"etag-{self.puts}"')
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.s3 = FakeS3()
+        self.aws = MagicMock()
+        self.aws.bucket_name = 'bucket-name'
+        self.aws.s3_client.return_value = self.s3
+
+    def files(self):
+        body, _ = self.s3.objects[manifest_key('area/')]
+        return json.loads(body)['files']
+
+    def test_recorded_files_written_to_manifest(self):
+        manifest = Manifest(self.aws, 'area/')
+        manifest.record('area/file1', 10, 'md5-1', 'text/plain')
+        manifest.record('area/dir/file2', 20, 'md5-2', 'text/plain')
+
+        self.assertTrue(manifest.flush())
+
+        self.assertEqual(sorted(self.files()), ['dir/file2', 'file1'])
+        self.assertEqual(self.files()['file1'][:3], [10, 'md5-1', 'text/plain'])
+        self.assertTrue(is_manifest(manifest.key))
+
+    def test_md5_only_trusted_for_unmodified_object_of_same_size(self):
+        manifest = Manifest(self.aws, 'area/')
+        manifest.record('area/file1', 10, 'md5-1', 'text/plain')
+        manifest.flush()
+        uploaded = self.files()['file1'][3]
+
+        reader = Manifest(self.aws, 'area/')
+
+        self.assertEqual(reader.md5('area/file1', 10, uploaded - 1), 'md5-1')
+        self.assertIsNone(reader.md5('area/file1', 11, uploaded - 1))
+        self.assertIsNone(reader.md5('area/file1', 10, uploaded + 60))
+        self.assertIsNone(reader.md5('area/other', 10))
+
+    def test_concurrent_uploaders_keep_each_others_files(self):
+        first = Manifest(self.aws, 'area/')
+        first.record('area/file1', 10, 'md5-1', 'text/plain')
+        first.flush()
+
+        second = Manifest(self.aws, 'area/')
+        second.record('area/file2', 20, 'md5-2', 'text/plain')
+        third = Manifest(self.aws, 'area/')
+        third.record('area/file3', 30, 'md5-3', 'text/plain')
+        # third writes between the read and the write of second
+        self.s3.before_put = third.flush
+
+        with patch('ait.commons.util.manifest.time.sleep'):
+            self.assertTrue(second.flush())
+
+        self.assertEqual(sorted(self.files()), ['file1', 'file2', 'file3'])
+
+    def test_unwritten_files_kept_for_next_flush(self):
+        self.s3.put_object = MagicMock(side_effect=ClientError({'Error': {'Code': 'InternalError'}}, 'PutObject'))
+        manifest = Manifest(self.aws, 'area/')
+        manifest.record('area/file1', 10, 'md5-1', 'text/plain')
+
+        self.assertFalse(manifest.flush())
+
+        del self.s3.put_object
+        self.assertTrue(manifest.flush())
+        self.assertEqual(list(self.files()), ['file1'])
+
+    def test_connection_error_not_raised_by_record(self):
+        self.s3.get_object = MagicMock(side_effect=EndpointConnectionError(endpoint_url='https://s3'))
+
+        with patch('ait.commons.util.manifest.MANIFEST_FLUSH_FILES', 1):
+            manifest = Manifest(self.aws, 'area/')
+            manifest.record('area/file1', 10, 'md5-1', 'text/plain')
+
+        self.assertFalse(manifest.flush())
+        self.assertEqual(list(manifest._pending), ['file1'])
+
+        del self.s3.get_object
+        self.assertTrue(manifest.flush())
+        self.assertEqual(list(self.files()), ['file1'])
+
+    def test_recording_stopped_once_denied(self):
+        self.s3.get_object = MagicMock(side_effect=ClientError({'Error': {'Code': 'AccessDenied'}}, 'GetObject'))
+
+        with patch('ait.commons.util.manifest.MANIFEST_FLUSH_FILES', 2):
+            manifest = Manifest(self.aws, 'area/')
+            for i in range(10):
+                manifest.record(f'area/file{i}', i, f'md5-{i}', 'text/plain')
+
+        self.assertTrue(manifest.denied)
+        self.assertFalse(manifest.flush())
+        self.assertEqual(self.s3.get_object.call_count, 1)
+
+    def test_flushes_less_frequent_as_manifest_grows(self):
+        with patch('ait.commons.util.manifest.MANIFEST_FLUSH_FILES', 10):
+            manifest = Manifest(self.aws, 'area/')
+            for i in range(1000):
+                manifest.record(f'area/file{i}', i, f'md5-{i}', 'text/plain')
+            manifest.flush()
+
+        self.assertEqual(len(self.files()), 1000)
+        self.assertLess(self.s3.puts, 20)  # a flush every 10 files would be 100
+
+
+if __name__ == '__main__':
+    unittest.main()
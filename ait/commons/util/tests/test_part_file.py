@@ -0,0 +1,59 @@
+import io
+import os
+import tempfile
+import unittest
+
+from botocore.response import StreamingBody
+
+from ait.commons.util.part_file import PartFile
+
+
+def body(data):
+    return StreamingBody(io.BytesIO(data), len(data))
+
+
+class TestPartFile(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'file.fastq')
+        self.content = bytes(range(250))
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_parts_written_at_their_offset(self):
+        part_file = PartFile(self.path, '"etag"', 250, 100)
+        part_file.open()
+
+        for n in (3, 1, 2):
+            first, last = part_file.part_range(n)
+            part_file.write(n, body(self.content[first:last + 1]))
+        part_file.commit()
+
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertFalse(os.path.exists(part_file.part_path))
+        self.assertFalse(os.path.exists(part_file.sidecar_path))
+
+    def test_interrupted_download_resumed(self):
+        part_file = PartFile(self.path, '"etag"', 250, 100)
+        part_file.open()
+        part_file.write(2, body(self.content[100:200]))
+
+        resumed = PartFile(self.path, '"etag"', 250, 100)
+
+        self.assertEqual(resumed.open(), {2})
+
+    def test_download_of_changed_object_restarted(self):
+        part_file = PartFile(self.path, '"etag"', 250, 100)
+        part_file.open()
+        part_file.write(2, body(self.content[100:200]))
+
+        restarted = PartFile(self.path, '"new-etag"', 250, 100)
+
+        self.assertEqual(restarted.open(), set())
+        self.assertEqual(os.path.getsize(restarted.part_path), 250)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+from unittest.mock import patch
+
+from ait.commons.util.progress import Progress
+
+
+class TestProgress(unittest.TestCase):
+    def test_bytes_aggregated_over_files(self):
+        progress = Progress('Uploading', enabled=False)
+        file1 = progress.add('dir/file1', 100)
+        file2 = progress.add('dir/file2', 50)
+
+        file1(30)
+        file1(20)
+        file2(50)
+        file2.done()
+
+        seen, total, done_count, file_count, top = progress.snapshot()
+        self.assertEqual((seen, total, done_count, file_count), (100, 150, 1, 2))
+        self.assertEqual(top, [file1])
+
+    def test_bytes_not_transferred_no_longer_expected(self):
+        progress = Progress('Uploading', enabled=False)
+        with progress.file('file1', 100) as file1:
+            file1(40)
+        with progress.file('file2', 100):
+            pass
+
+        seen, total, done_count, file_count, top = progress.snapshot()
+        self.assertEqual((seen, total, done_count, file_count, top), (40, 40, 2, 2, []))
+
+    @patch('ait.commons.util.progress.PROGRESS_TOP_FILES', 2)
+    def test_top_files_are_started_files_with_most_bytes_left(self):
+        progress = Progress('Downloading', enabled=False)
+        progress.expect(10000, count=2)  # queued, not started
+        small = progress.add('small', 10)
+        large = progress.add('large', 1000)
+        started = progress.add('started', 1000)
+        started(900)
+
+        seen, total, done_count, file_count, top = progress.snapshot()
+
+        self.assertEqual(top, [large, started])
+        self.assertNotIn(small, top)
+        self.assertEqual((seen, total, done_count, file_count), (900, 12010, 0, 5))
+
+    def test_queued_files_registered_when_started(self):
+        progress = Progress('Downloading', enabled=False)
+        progress.expect(100)
+        progress.expect(50)
+
+        *_, top = progress.snapshot()
+        self.assertEqual(top, [])
+
+        with progress.file('file1', 100, expected=True) as file1:
+            file1(100)
+            *_, top = progress.snapshot()
+            self.assertEqual(top, [file1])
+
+        seen, total, done_count, file_count, top = progress.snapshot()
+        self.assertEqual((seen, total, done_count, file_count, top), (100, 150, 1, 2, []))
+
+    @patch('ait.commons.util.progress.tqdm')
+    def test_disabled_progress_not_rendered(self, tqdm):
+        with Progress('Uploading', enabled=False) as progress:
+            progress.add('file1', 100)(100)
+            progress.write('message')
+
+        tqdm.assert_not_called()
+        tqdm.write.assert_not_called()
+
+    @patch('ait.commons.util.progress.tqdm')
+    def test_single_bar_rendered(self, tqdm):
+        bar = tqdm.return_value
+        bar.n = 0
+
+        with Progress('Uploading', interval=60) as progress:
+            progress.add('file1', 100)(60)
+            progress.add('file2', 100)(40)
+
+        tqdm.assert_called_once()
+        bar.update.assert_called_once_with(100)
+        self.assertEqual(bar.total, 200)
+        bar.close.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
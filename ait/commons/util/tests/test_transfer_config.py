@@ -0,0 +1,41 @@
+import unittest
+
+from ait.commons.util.settings import TRANSFER_MAX_CONCURRENCY
+from ait.commons.util.transfer_config import get_transfer_config, get_chunk_size, get_concurrency, MB, \
+    MIN_CHUNK_SIZE, MAX_MULTIPART_COUNT
+
+GB = 1024 * MB
+
+
+class TestTransferConfig(unittest.TestCase):
+    def test_small_file_transferred_on_calling_thread(self):
+        config = get_transfer_config(10 * MB, files_in_flight=1)
+
+        self.assertFalse(config.use_threads)
+        self.assertEqual(get_concurrency(10 * MB), 1)
+
+    def test_large_file_parts_within_part_limit(self):
+        filesize = 2000 * GB
+
+        chunk_size = get_chunk_size(filesize)
+
+        self.assertGreater(chunk_size, MIN_CHUNK_SIZE)
+        self.assertLessEqual((filesize + chunk_size - 1) // chunk_size, MAX_MULTIPART_COUNT)
+        self.assertEqual(chunk_size % MB, 0)
+        self.assertEqual(get_transfer_config(filesize).multipart_chunksize, chunk_size)
+
+    def test_concurrency_bounded_by_parts(self):
+        self.assertEqual(get_concurrency(3 * MIN_CHUNK_SIZE), 3)
+
+    def test_concurrency_shared_between_files_in_flight(self):
+        single = get_concurrency(100 * GB, files_in_flight=1)
+        shared = get_concurrency(100 * GB, files_in_flight=50)
+
+        self.assertEqual(single, TRANSFER_MAX_CONCURRENCY)
+        self.assertLess(shared, single)
+        self.assertGreaterEqual(shared, 1)
+        self.assertEqual(get_transfer_config(100 * GB, files_in_flight=50).max_concurrency, shared)
+
+
+if __name__ == '__main__':
+    unittest.main()
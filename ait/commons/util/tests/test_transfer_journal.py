@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from ait.commons.util.transfer_journal import TransferJournal, JournalEntry
+
+
+class TestTransferJournal(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.journal = TransferJournal(db_file=os.path.join(self.tmp_dir.name, 'transfers.db'))
+        self.data_file = os.path.join(self.tmp_dir.name, 'file')
+        with open(self.data_file, 'wb') as f:
+            f.write(b'content')
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def entry(self, key='area/file', upload_id='upload-id'):
+        st = os.stat(self.data_file)
+        return JournalEntry('bucket', key, self.data_file, st.st_size, st.st_mtime_ns, 'md5', upload_id, 8)
+
+    def test_parts_recorded_as_they_complete(self):
+        self.journal.start(self.entry())
+        self.journal.add_part('upload-id', 1, 'etag-1')
+        self.journal.add_part('upload-id', 2, 'etag-2')
+
+        entry = self.journal.get('bucket', 'area/file')
+
+        self.assertEqual(entry.upload_id, 'upload-id')
+        self.assertEqual(entry.part_size, 8)
+        self.assertEqual(entry.parts, {1: 'etag-1', 2: 'etag-2'})
+        self.assertTrue(entry.matches(self.data_file, os.stat(self.data_file), 'md5'))
+        self.assertFalse(entry.matches(self.data_file, os.stat(self.data_file), 'other-md5'))
+
+    def test_pending_uploads_under_prefix(self):
+        self.journal.start(self.entry('area/file1', 'upload-1'))
+        self.journal.start(self.entry('area/file2', 'upload-2'))
+        self.journal.start(self.entry('other-area/file', 'upload-3'))
+
+        pending = self.journal.pending('bucket', 'area/')
+
+        self.assertEqual([e.key for e in pending], ['area/file1', 'area/file2'])
+
+    def test_remove(self):
+        entry = self.entry()
+        self.journal.start(entry)
+        self.journal.add_part('upload-id', 1, 'etag-1')
+
+        self.journal.remove(entry)
+
+        self.assertIsNone(self.journal.get('bucket', 'area/file'))
+        self.journal.start(entry)
+        self.assertEqual(self.journal.get('bucket', 'area/file').parts, {})
+
+    def test_uploads_of_running_processes_not_interrupted(self):
+        self.journal.start(self.entry())
+        other = self.entry('area/other', 'upload-2')
+        other.pid = os.getppid()
+        self.journal.start(other)
+
+        self.assertEqual(self.journal.get('bucket', 'area/file').pid, os.getpid())
+        self.assertFalse(self.journal.get('bucket', 'area/file').is_interrupted())
+        self.assertFalse(self.journal.get('bucket', 'area/other').is_interrupted())
+
+
+if __name__ == '__main__':
+    unittest.main()
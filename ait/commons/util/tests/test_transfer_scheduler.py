@@ -0,0 +1,98 @@
+import threading
+import time
+import unittest
+
+from ait.commons.util.transfer_config import MB
+from ait.commons.util.transfer_scheduler import TransferScheduler
+
+GB = 1024 * MB
+
+
+class TestTransferScheduler(unittest.TestCase):
+    def setUp(self) -> None:
+        self.scheduler = TransferScheduler(max_workers=4, max_connections=8, max_bytes_in_flight=100)
+
+    def tearDown(self) -> None:
+        self.scheduler.shutdown()
+
+    def test_file_transfers_bounded_by_max_workers(self):
+        running = []
+        max_running = []
+        lock = threading.Lock()
+
+        def transfer(_):
+            with lock:
+                running.append(1)
+                max_running.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.pop()
+
+        futures = [self.scheduler.submit(transfer, i) for i in range(20)]
+        for future in futures:
+            future.result()
+
+        self.assertLessEqual(max(max_running), 4)
+
+    def test_threads_per_file_within_connections(self):
+        for file_count in [1, 2, 4, 100]:
+            files_in_flight = self.scheduler.files_in_flight(file_count)
+            concurrency = self.scheduler.concurrency(100 * GB, file_count)
+            self.assertLessEqual(files_in_flight * concurrency, 8)
+
+    def test_buffer_waits_for_bytes_in_flight(self):
+        acquired = threading.Event()
+
+        def acquire():
+            with self.scheduler.buffer(60):
+                acquired.set()
+
+        with self.scheduler.buffer(60):
+            t = threading.Thread(target=acquire)
+            t.start()
+            self.assertFalse(acquired.wait(0.05))
+            self.assertEqual(self.scheduler.bytes_in_flight, 60)
+
+        t.join(1)
+        self.assertTrue(acquired.is_set())
+
+    def test_buffer_larger_than_budget_allowed_alone(self):
+        with self.scheduler.buffer(500):
+            self.assertEqual(self.scheduler.bytes_in_flight, 500)
+        self.assertEqual(self.scheduler.bytes_in_flight, 0)
+
+    def test_part_transfers_hold_a_connection(self):
+        in_use = []
+
+        def part(_):
+            in_use.append(self.scheduler.connections_in_use)
+
+        with self.scheduler.connections(7):
+            futures = [self.scheduler.submit_part(part, i) for i in range(10)]
+            for future in futures:
+                future.result()
+
+        self.assertEqual(max(in_use), 8)
+        self.assertEqual(self.scheduler.connections_in_use, 0)
+
+    def test_boto_transfer_waits_for_its_connections(self):
+        config = self.scheduler.transfer_config(100 * GB, 1)
+        acquired = threading.Event()
+
+        def transfer():
+            with self.scheduler.connections_for(config):
+                acquired.set()
+
+        with self.scheduler.connections(1):
+            t = threading.Thread(target=transfer)
+            t.start()
+            self.assertFalse(acquired.wait(0.05))
+            self.assertEqual(self.scheduler.connections_in_use, 1)
+
+        t.join(1)
+        self.assertTrue(acquired.is_set())
+        self.assertEqual(config.max_concurrency, 8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+from boto3.s3.transfer import TransferConfig
+
+from ait.commons.util.settings import TRANSFER_MAX_CONCURRENCY, S3_MAX_POOL_CONNECTIONS
+
+# this is based on the dcplib s3_multipart module
+KB = 1024
+MB = KB * KB
+MIN_CHUNK_SIZE = 64 * MB
+MULTIPART_THRESHOLD = MIN_CHUNK_SIZE + 1
+MAX_MULTIPART_COUNT = 10000  # s3 imposed
+
+
+def get_transfer_config(filesize, files_in_flight=1, max_connections=S3_MAX_POOL_CONNECTIONS):
+    """
+    Transfer config for a file of filesize transferred alongside files_in_flight - 1 other files.
+    Parts are sized to stay within the s3 part limit, and the threads per file are a share of the
+    connections (max_connections), so that the total stays the same however many files are in flight.
+    Files below the multipart threshold are transferred on the calling thread.
+    """
+    if filesize < MULTIPART_THRESHOLD:
+        return TransferConfig(multipart_threshold=MULTIPART_THRESHOLD, use_threads=False)
+
+    return TransferConfig(multipart_threshold=MULTIPART_THRESHOLD,
+                          multipart_chunksize=get_chunk_size(filesize),
+                          max_concurrency=get_concurrency(filesize, files_in_flight, max_connections))
+
+
+def get_concurrency(filesize, files_in_flight=1, max_connections=S3_MAX_POOL_CONNECTIONS):
+    """Threads for the parts of one file - its share of the connections, no more than its number of parts."""
+    if filesize < MULTIPART_THRESHOLD:
+        return 1
+
+    chunk_size = get_chunk_size(filesize)
+    part_count = (filesize + chunk_size - 1) // chunk_size
+    share = max_connections // max(1, files_in_flight)
+    return max(1, min(TRANSFER_MAX_CONCURRENCY, share, part_count))
+
+
+def get_chunk_size(filesize):
+    if filesize <= MAX_MULTIPART_COUNT * MIN_CHUNK_SIZE:
+        return MIN_CHUNK_SIZE
+    else:
+        div = filesize // MAX_MULTIPART_COUNT
+        if div * MAX_MULTIPART_COUNT < filesize:
+            div += 1
+        return ((div + MB - 1) // MB) * MB
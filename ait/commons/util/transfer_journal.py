@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+
+from ait.commons.util.common import sqlite_connect
+from ait.commons.util.settings import TRANSFER_JOURNAL_FILE
+
+
+def pid_alive(pid):
+    """True if a process with the pid is running."""
+    if os.name == 'nt':
+        # os.kill would signal the process on Windows, query it instead
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            exit_code = ctypes.c_ulong()
+            ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+            return exit_code.value == 259  # STILL_ACTIVE
+        finally:
+            ctypes.windll.kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # running, as another user
+    except OSError:
+        return False
+    return True
+
+
+class JournalEntry:
+    """
+    A multipart upload in progress - the local file it was started from (path and stat
+    signature), its S3 UploadId and part size, the ETags of the parts completed so far,
+    and the pid of the process uploading it.
+    """
+
+    def __init__(self, bucket, key, path, size, mtime_ns, md5, upload_id, part_size, created=None, parts=None,
+                 pid=None):
+        self.bucket = bucket
+        self.key = key
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.md5 = md5
+        self.upload_id = upload_id
+        self.part_size = part_size
+        self.created = created
+        self.parts = parts or {}  # part number -> ETag
+        self.pid = pid
+
+    def matches(self, path, st, md5):
+        """True if the upload was started from the same, unmodified file."""
+        return self.path == path and self.size == st.st_size and self.mtime_ns == st.st_mtime_ns \
+            and self.md5 == md5
+
+    def is_interrupted(self):
+        """
+        True if the process uploading it is gone. The journal is shared by all the processes of the user,
+        the uploads of the ones still running are in progress, not interrupted.
+        """
+        return self.pid is None or (self.pid != os.getpid() and not pid_alive(self.pid))
+
+    def __str__(self):
+        return f'JournalEntry (key={self.key}, path={self.path}, upload_id={self.upload_id}, ' \
+               f'part_size={self.part_size}, parts={len(self.parts)})'
+
+
+class TransferJournal:
+    """
+    Local journal of multipart uploads, recorded part by part as they complete so that
+    an upload interrupted (even by killing the process) can be resumed by a later run.
+    Same sqlite setup as the hash cache, shared by parallel CLI processes.
+    """
+
+    def __init__(self, db_file=TRANSFER_JOURNAL_FILE):
+        self.db_file = db_file
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite_connect(self.db_file,
+                                  'CREATE TABLE IF NOT EXISTS uploads ('
+                                  'bucket TEXT, key TEXT, path TEXT, size INTEGER, mtime_ns INTEGER, md5 TEXT, '
+                                  'upload_id TEXT, part_size INTEGER, created REAL, pid INTEGER, '
+                                  'PRIMARY KEY (bucket, key))',
+                                  'CREATE TABLE IF NOT EXISTS parts ('
+                                  'upload_id TEXT, part_number INTEGER, etag TEXT, '
+                                  'PRIMARY KEY (upload_id, part_number))')
+            self._local.conn = conn
+        return conn
+
+    def _entry(self, row):
+        bucket, key, path, size, mtime_ns, md5, upload_id, part_size, created, pid = row
+        parts = dict(self._connection().execute('SELECT part_number, etag FROM parts WHERE upload_id = ?',
+                                                (upload_id,)).fetchall())
+        return JournalEntry(bucket, key, path, size, mtime_ns, md5, upload_id, part_size, created, parts, pid)
+
+    def get(self, bucket, key):
+        """Returns None if there is no upload in progress for key."""
+        row = self._connection().execute('SELECT bucket, key, path, size, mtime_ns, md5, upload_id, part_size, '
+                                         'created, pid FROM uploads WHERE bucket = ? AND key = ?',
+                                         (bucket, key)).fetchone()
+        return self._entry(row) if row else None
+
+    def pending(self, bucket, prefix):
+        """Uploads in progress for keys under prefix."""
+        rows = self._connection().execute('SELECT bucket, key, path, size, mtime_ns, md5, upload_id, part_size, '
+                                          'created, pid FROM uploads WHERE bucket = ? AND substr(key, 1, ?) = ? '
+                                          'ORDER BY key', (bucket, len(prefix), prefix)).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def start(self, entry):
+        """Record the upload, by the calling process unless the entry has a pid."""
+        entry.created = time.time()
+        if entry.pid is None:
+            entry.pid = os.getpid()
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO uploads (bucket, key, path, size, mtime_ns, md5, upload_id, '
+                         'part_size, created, pid) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         (entry.bucket, entry.key, entry.path, entry.size, entry.mtime_ns, entry.md5,
+                          entry.upload_id, entry.part_size, entry.created, entry.pid))
+
+    def add_part(self, upload_id, part_number, etag):
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO parts (upload_id, part_number, etag) VALUES (?, ?, ?)',
+                         (upload_id, part_number, etag))
+
+    def remove(self, entry):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM parts WHERE upload_id = ?', (entry.upload_id,))
+            conn.execute('DELETE FROM uploads WHERE bucket = ? AND key = ? AND upload_id = ?',
+                         (entry.bucket, entry.key, entry.upload_id))
+
+
+_transfer_journal = None
+_transfer_journal_lock = threading.Lock()
+
+
+def get_transfer_journal():
+    global _transfer_journal
+    with _transfer_journal_lock:
+        if _transfer_journal is None:
+            _transfer_journal = TransferJournal()
+        return _transfer_journal
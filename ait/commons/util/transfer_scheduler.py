@@ -0,0 +1,141 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from ait.commons.util.settings import TRANSFER_MAX_WORKERS, S3_MAX_POOL_CONNECTIONS, TRANSFER_MAX_BYTES_IN_FLIGHT
+from ait.commons.util.transfer_config import get_transfer_config, get_concurrency
+
+
+class Budget:
+    """Amount of a resource shared by threads, reserved by each before use and released after."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def reserve(self, amount):
+        """
+        Reserve amount of the budget, waiting for other threads to release theirs.
+        A reservation larger than the budget is allowed once nothing else is reserved.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._in_use == 0 or self._in_use + amount <= self.limit)
+            self._in_use += amount
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_use -= amount
+                self._cond.notify_all()
+
+    @property
+    def in_use(self):
+        with self._cond:
+            return self._in_use
+
+
+class TransferScheduler:
+    """
+    Single resource ceiling shared by the upload, download and sync transfers of the process.
+    - files are transferred by a pool of max_workers threads
+    - the parts of a file are transferred either by boto, with its share of max_connections
+      threads (see transfer_config), or by the shared pool of max_connections part threads
+    - every transfer request holds one of max_connections connections: a part of the part pool holds
+      one while it's sent (submit_part), a boto transfer one per thread of its config (connections_for)
+    - parts read into memory by the part threads and boto uploads from a stream count against
+      max_bytes_in_flight; the other boto transfers stream from or to disk (or copy server side)
+    so the number of threads, open connections and buffered bytes don't grow with the number of files.
+    """
+
+    def __init__(self, max_workers=TRANSFER_MAX_WORKERS, max_connections=S3_MAX_POOL_CONNECTIONS,
+                 max_bytes_in_flight=TRANSFER_MAX_BYTES_IN_FLIGHT):
+        self.max_workers = max_workers
+        self.max_connections = max_connections
+        self.max_bytes_in_flight = max_bytes_in_flight
+        self._connections = Budget(max_connections)
+        self._bytes = Budget(max_bytes_in_flight)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._part_executor = None
+
+    @property
+    def executor(self):
+        """Pool of the file transfers."""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    @property
+    def part_executor(self):
+        """Pool of the parts transferred outside boto, shared by all files."""
+        with self._lock:
+            if self._part_executor is None:
+                self._part_executor = ThreadPoolExecutor(max_workers=self.max_connections)
+            return self._part_executor
+
+    def submit(self, fn, *args, **kwargs):
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def submit_part(self, fn, *args, **kwargs):
+        """Run a part transfer on the part pool, holding a connection while it runs."""
+        def run():
+            with self.connections(1):
+                return fn(*args, **kwargs)
+
+        return self.part_executor.submit(run)
+
+    def files_in_flight(self, file_count):
+        return max(1, min(self.max_workers, file_count))
+
+    def transfer_config(self, filesize, file_count):
+        """boto transfer config for one of file_count files, within its share of the connections."""
+        return get_transfer_config(filesize, self.files_in_flight(file_count), self.max_connections)
+
+    def concurrency(self, filesize, file_count):
+        return get_concurrency(filesize, self.files_in_flight(file_count), self.max_connections)
+
+    def connections(self, count):
+        """Reserve count of the connections, waiting for other transfers to release theirs."""
+        return self._connections.reserve(count)
+
+    def connections_for(self, config):
+        """Reserve the connections of a boto transfer with config, one per thread."""
+        return self.connections(config.max_concurrency if config.use_threads else 1)
+
+    @property
+    def connections_in_use(self):
+        return self._connections.in_use
+
+    def buffer(self, nbytes):
+        """
+        Reserve nbytes of the in-flight budget, waiting for other transfers to release theirs.
+        A reservation larger than the budget is allowed once nothing else is in flight.
+        """
+        return self._bytes.reserve(nbytes)
+
+    @property
+    def bytes_in_flight(self):
+        return self._bytes.in_use
+
+    def shutdown(self):
+        with self._lock:
+            for executor in (self._executor, self._part_executor):
+                if executor is not None:
+                    executor.shutdown(wait=True)
+            self._executor = None
+            self._part_executor = None
+
+
+_transfer_scheduler = None
+_transfer_scheduler_lock = threading.Lock()
+
+
+def get_transfer_scheduler():
+    global _transfer_scheduler
+    with _transfer_scheduler_lock:
+        if _transfer_scheduler is None:
+            _transfer_scheduler = TransferScheduler()
+        return _transfer_scheduler
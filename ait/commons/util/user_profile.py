@@ -6,6 +6,7 @@ from ait.commons.util.settings import AWS_CONFIG_FILE, AWS_CREDENTIALS_FILE, DEF
 
 class UserProfile:
     def __init__(self):
+        self.name = None
         self.access_key = None
         self.secret_key = None
         self.session_token = None
@@ -37,6 +38,7 @@ def get_profile(profile):
     credentials.read(AWS_CREDENTIALS_FILE)
 
     user_profile = UserProfile()
+    user_profile.name = profile
 
     if credentials.has_section(profile):
         user_profile.access_key = credentials[profile].get('aws_access_key_id')
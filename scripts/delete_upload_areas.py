@@ -1,19 +1,17 @@
 import sys
 
-from tests.e2e.test_utils import run, search_all_uuids
+from ait.commons.util.__main__ import parse_args
+from ait.commons.util.cmd import Cmd
+from ait.commons.util.tests.e2e.test_utils import search_all_uuids
 
 FILENAME = sys.argv[1]  # file which contains uuids to delete
 
-CLI = 'morphic-util'
-
-code, output, error = run(FILENAME)
-uuids = search_all_uuids(output)
+with open(FILENAME, 'r') as f:
+    uuids = search_all_uuids(f.read())
 
 print(uuids)
 
 print(len(uuids))
 
-for uuid in uuids:
-    run(f'{CLI} select {uuid}')
-    run(f'{CLI} delete -d', "y\n")
-    print(f'deleted {uuid}!')
+# all areas deleted by a single delete-areas command, in this process
+Cmd(parse_args(['delete-areas', *uuids]))